@@ -0,0 +1,144 @@
+"""Compare appointment lookups by short code and customer name with the former queries.
+
+Usage:
+    uv run python benchmarks/bench_appointment_lookup.py --appointments 1000000 --lookups 200
+
+CONFIRM/CANCEL used to find appointments with `id LIKE 'prefix%'` and names with
+`customer_name ILIKE '%name%'`; SQLite serves neither from an index. They are
+compared with AppointmentService.find_by_short_code (unique index) and
+find_by_customer_name (FTS5), on a throwaway SQLite database.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_PATH", os.path.join(_tmpdir.name, "bench.db"))
+
+from sqlalchemy import insert, select
+
+import models
+from database import AsyncSessionLocal, async_engine, engine, init_db
+from initial_data import HAIRSTYLES_SEED
+from services.appointment_service import AppointmentService
+
+FIRST_NAMES = ["Aïcha", "Fatou", "Marie", "Hélène", "Awa", "Mariam", "Grace", "Inès", "Nadia", "Chloé",
+               "Aminata", "Sarah", "Léa", "Kadi", "Emma", "Ruth", "Binta", "Sophie", "Yasmine", "Joëlle"]
+
+
+def last_names(count):
+    rng = random.Random(1)
+    syllables = ["ba", "di", "ko", "ma", "ne", "sou", "ta", "lo", "gue", "ri", "dja", "mbe", "to", "sy", "fa"]
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(syllables) for _ in range(4)).capitalize())
+    return sorted(names)
+
+
+def seed(count):
+    with engine.begin() as conn:
+        conn.execute(insert(models.Hairstyle), HAIRSTYLES_SEED)
+    # Few appointments per customer, as in a salon's real history
+    surnames = last_names(20000)
+    start = datetime(2024, 1, 1, 9)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(count):
+            batch.append({
+                "id": str(uuid.uuid4()),
+                # Sequential codes: the benchmark does not need to handle random collisions
+                "short_code": f"{i:08x}",
+                "style_id": 1 + i % len(HAIRSTYLES_SEED),
+                "customer_name": f"{random.choice(FIRST_NAMES)} {random.choice(surnames)}",
+                "telephone": "0000",
+                "date": start + timedelta(minutes=30 * i),
+                "end_at": start + timedelta(minutes=30 * i + 120),
+                "status": "confirmed",
+                "created_at": start,
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(models.Appointment), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.Appointment), batch)
+
+
+async def timed(label, lookup, keys, expect_found=True):
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for key in keys:
+            started = time.perf_counter()
+            found = await lookup(db, key)
+            samples.append(time.perf_counter() - started)
+            assert (found is not None) == expect_found, (label, key)
+    print(f"{label:<40} median {statistics.median(samples) * 1000:8.2f} ms   max {max(samples) * 1000:8.2f} ms")
+    return statistics.median(samples)
+
+
+async def old_by_prefix(db, key):
+    result = await db.execute(select(models.Appointment).where(models.Appointment.id.like(f"{key}%")).limit(1))
+    return result.scalars().first()
+
+
+async def old_by_name(db, key):
+    result = await db.execute(
+        select(models.Appointment)
+        .where(models.Appointment.status != "canceled")
+        .where(models.Appointment.customer_name.ilike(f"%{key}%"))
+        .order_by(models.Appointment.date.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    started = time.perf_counter()
+    init_db()
+    seed(args.appointments)
+    print(f"{args.appointments} appointments seeded in {time.perf_counter() - started:.1f}s")
+
+    async with AsyncSessionLocal() as db:
+        sample = (await db.execute(
+            select(models.Appointment.id, models.Appointment.short_code, models.Appointment.customer_name)
+            .order_by(models.Appointment.date)
+        )).all()
+    rows = random.sample(sample, min(args.lookups, len(sample)))
+    del sample
+
+    old = await timed("id LIKE 'prefix%'", old_by_prefix, [r.id[:8] for r in rows])
+    new = await timed("find_by_short_code", lambda db, k: AppointmentService(db).find_by_short_code(k),
+                      [r.short_code for r in rows])
+    print(f"  -> {old / new:.0f}x faster")
+    names = [r.customer_name for r in rows]
+    old = await timed("customer_name ILIKE '%name%'", old_by_name, names)
+    new = await timed("find_by_customer_name (FTS5)",
+                      lambda db, k: AppointmentService(db).find_by_customer_name(k, active_only=True), names)
+    print(f"  -> {old / new:.0f}x faster")
+    # Typos and unknown customers: the substring match reads the whole table
+    unknown = [f"{name}x" for name in names[:20]]
+    old = await timed("ILIKE, unknown name", old_by_name, unknown, expect_found=False)
+    new = await timed("FTS5, unknown name",
+                      lambda db, k: AppointmentService(db).find_by_customer_name(k, active_only=True), unknown,
+                      expect_found=False)
+    print(f"  -> {old / new:.0f}x faster")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
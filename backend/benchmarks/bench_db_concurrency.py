@@ -0,0 +1,140 @@
+"""Compare request concurrency with the synchronous Session and with AsyncSession.
+
+Usage:
+    uv run python benchmarks/bench_db_concurrency.py --appointments 10000 --requests 400 --concurrency 50
+
+Each simulated request lists a week of appointments with their hairstyle, the
+query behind TODAY/LIST. The "sync" mode runs it on a blocking Session inside
+the event loop (how the routers used to work); "async" awaits AsyncSession.
+A heartbeat task measures how long the event loop is stalled meanwhile, which is
+the delay every other request (LLM calls, webhooks) would see.
+
+A throwaway SQLite database is created in a temporary directory.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_PATH", os.path.join(_tmpdir.name, "bench.db"))
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+import models
+from database import AsyncSessionLocal, SessionLocal, async_engine, init_db
+from initial_data import HAIRSTYLES_SEED
+from services.appointment_service import AppointmentService, compute_end_at
+
+
+def seed(count):
+    with SessionLocal() as db:
+        if db.query(models.Hairstyle).count() == 0:
+            db.add_all(models.Hairstyle(**style) for style in HAIRSTYLES_SEED)
+            db.commit()
+        styles = db.query(models.Hairstyle).all()
+        start = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        for i in range(count):
+            style = random.choice(styles)
+            date = start + timedelta(days=i % 365, minutes=15 * (i // 365 % 36))
+            db.add(models.Appointment(
+                style_id=style.id,
+                customer_name=f"Client {i}",
+                telephone="0000",
+                date=date,
+                end_at=compute_end_at(date, style),
+                status="confirmed",
+            ))
+        db.commit()
+
+
+def _week():
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=7)
+
+
+async def sync_request():
+    start, end = _week()
+    with SessionLocal() as db:
+        appts = db.execute(
+            select(models.Appointment)
+            .options(joinedload(models.Appointment.style))
+            .where(models.Appointment.date >= start, models.Appointment.date < end)
+            .order_by(models.Appointment.date)
+        ).scalars().all()
+        return len([a.style.name for a in appts])
+
+
+async def async_request():
+    start, end = _week()
+    async with AsyncSessionLocal() as db:
+        appts = await AppointmentService(db).list_appointments(start, end)
+        return len([a.style.name for a in appts])
+
+
+async def heartbeat(stalls, stop, interval=0.005):
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - before - interval)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(mode, handler, requests, concurrency):
+    await handler()  # warm-up: pool connections, statement compilation
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await handler()
+            latencies.append(time.perf_counter() - started)
+
+    stalls, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stalls, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await beat
+
+    print(
+        f"{mode:>5} | {requests / elapsed:7.1f} req/s"
+        f" | p50 {statistics.median(latencies) * 1000:7.1f} ms"
+        f" | p95 {_percentile(latencies, 95) * 1000:7.1f} ms"
+        f" | event loop stall p95 {_percentile(stalls, 95) * 1000:6.1f} ms, max {max(stalls) * 1000:6.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--appointments", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.appointments)
+    print(f"{args.appointments} appointments, {args.requests} requests @ concurrency {args.concurrency}")
+    await run("sync", sync_request, args.requests, args.concurrency)
+    await run("async", async_request, args.requests, args.concurrency)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
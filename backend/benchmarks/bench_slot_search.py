@@ -0,0 +1,96 @@
+"""Compare the free-slot search of SlotEngine with the former nested loop.
+
+Usage:
+    uv run python benchmarks/bench_slot_search.py --days 90 --per-day 30
+
+The former LLMService._tool_list_free_slots walked fixed steps between 09:00
+and 18:00 and tested every step against every busy period of the day. It is
+reproduced here at its original 1-hour step and at the 15-minute step the
+engine uses. Busy periods are generated in memory (no database), with many
+short, partly overlapping bookings per day to make the calendar dense.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.slot_engine import SlotEngine, parse_opening_hours
+
+
+def calendar(days, per_day, first_day):
+    busy = []
+    for offset in range(days):
+        opening = datetime.combine(first_day + timedelta(days=offset), datetime.min.time()).replace(hour=9)
+        for _ in range(per_day):
+            start = opening + timedelta(minutes=5 * random.randrange(0, 9 * 12))
+            busy.append((start, start + timedelta(minutes=random.choice((15, 30, 45, 60)))))
+    busy.sort()
+    return busy
+
+
+def legacy_free_slots(day_busy, day, step):
+    """The former nested loop: every step against every busy period."""
+    current = datetime.combine(day, datetime.min.time()).replace(hour=9)
+    closing_time = current.replace(hour=18)
+    free_slots = []
+    while current < closing_time:
+        next_step = current + step
+        is_occupied = False
+        for start, end in day_busy:
+            if (current < end) and (next_step > start):
+                is_occupied = True
+                break
+        if not is_occupied:
+            free_slots.append(current)
+        current = next_step
+    return free_slots
+
+
+def legacy_search(busy, first_day, days, step):
+    by_day = {}
+    for interval in busy:
+        by_day.setdefault(interval[0].date(), []).append(interval)
+    return [legacy_free_slots(by_day.get(first_day + timedelta(days=o), []), first_day + timedelta(days=o), step)
+            for o in range(days)]
+
+
+def timed(label, fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    median = statistics.median(samples) * 1000
+    print(f"{label:<38} {median:9.2f} ms")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--per-day", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    first_day = date(2026, 1, 5)
+    busy = calendar(args.days, args.per_day, first_day)
+    engine = SlotEngine(parse_opening_hours("mon-sun 09:00-18:00"), granularity_minutes=15)
+    print(f"{args.days} days, {len(busy)} busy periods")
+
+    baseline = timed("legacy loop, 1h steps", lambda: legacy_search(busy, first_day, args.days, timedelta(hours=1)), args.repeat)
+    legacy_15 = timed("legacy loop, 15 min steps", lambda: legacy_search(busy, first_day, args.days, timedelta(minutes=15)), args.repeat)
+    engine_ms = timed("SlotEngine.free_windows, 15 min", lambda: engine.free_windows(busy, first_day, args.days), args.repeat)
+    timed("SlotEngine.placements (3h30), 15 min",
+          lambda: engine.placements(busy, timedelta(hours=3, minutes=30), first_day, args.days), args.repeat)
+    print(f"speed-up vs legacy: {baseline / engine_ms:.1f}x (1h steps), {legacy_15 / engine_ms:.1f}x (15 min steps)")
+
+
+if __name__ == "__main__":
+    main()
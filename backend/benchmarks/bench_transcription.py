@@ -0,0 +1,97 @@
+"""Compare transcription backends on the same clips.
+
+Usage:
+    uv run python benchmarks/bench_transcription.py clip1.ogg clip2.ogg --backends groq local --concurrency 4
+
+The transcription cache is bypassed: each backend is called directly.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Add backend to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+
+from services.audio_ingest import ogg_duration_seconds
+from services.client_registry import ClientRegistry
+from services.transcription_backends import create_transcription_backend
+
+
+def _clip_seconds(path):
+    with open(path, "rb") as f:
+        return ogg_duration_seconds(f) or 0
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _transcribe(backend, path):
+    with open(path, "rb") as f:
+        started = time.perf_counter()
+        await backend.transcribe(f, os.path.basename(path))
+        return time.perf_counter() - started
+
+
+async def bench_backend(name, clips, concurrency, repeat):
+    registry = ClientRegistry()
+    backend = create_transcription_backend(registry.groq, name)
+    if backend is None:
+        print(f"{name}: unavailable (GROQ_API_KEY not set)")
+        await registry.aclose()
+        return
+
+    try:
+        # Warm-up (model load for local workers, TLS handshake for Groq)
+        await _transcribe(backend, clips[0])
+
+        latencies = []
+        for _ in range(repeat):
+            for clip in clips:
+                latencies.append(await _transcribe(backend, clip))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(clip):
+            async with semaphore:
+                return await _transcribe(backend, clip)
+
+        jobs = clips * repeat
+        started = time.perf_counter()
+        await asyncio.gather(*[bounded(clip) for clip in jobs])
+        elapsed = time.perf_counter() - started
+
+        audio_seconds = sum(_clip_seconds(clip) for clip in jobs)
+        print(
+            f"{name:>6} | p50 {statistics.median(latencies) * 1000:7.0f} ms"
+            f" | p95 {_percentile(latencies, 95) * 1000:7.0f} ms"
+            f" | {len(jobs) / elapsed:6.2f} clips/s @ concurrency {concurrency}"
+            + (f" | {audio_seconds / elapsed:6.1f}x realtime" if audio_seconds else "")
+        )
+    finally:
+        await backend.aclose()
+        await registry.aclose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="+")
+    parser.add_argument("--backends", nargs="+", default=["groq", "local"], choices=["groq", "local"])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name in args.backends:
+        await bench_backend(name, args.clips, args.concurrency, args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
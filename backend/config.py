@@ -1,6 +1,4 @@
 import os
-import models
-from database import engine
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,5 +8,90 @@ WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
 WAWP_BASE_URL = os.getenv("WAWP_BASE_URL")
 WAWP_ACCESS_TOKEN = os.getenv("WAWP_ACCESS_TOKEN")
 WAWP_API_INSTANCE = os.getenv("WAWP_API_INSTANCE")
-# Initialize database
-models.Base.metadata.create_all(bind=engine)
+WAWP_SEND_TEXT_PATH = os.getenv("WAWP_SEND_TEXT_PATH", "/v2/send/text")
+
+# Outbound WhatsApp notifications: persistent outbox, gateway rate limit and digests of bursts
+WHATSAPP_RATE_PER_MINUTE = float(os.getenv("WHATSAPP_RATE_PER_MINUTE", "20"))
+WHATSAPP_BURST = int(os.getenv("WHATSAPP_BURST", "5"))
+NOTIFY_BATCH_WINDOW_SECONDS = float(os.getenv("NOTIFY_BATCH_WINDOW_SECONDS", "3"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "5"))
+NOTIFY_DRAIN_TIMEOUT_SECONDS = float(os.getenv("NOTIFY_DRAIN_TIMEOUT_SECONDS", "10"))
+
+# Database: DATABASE_URL wins (e.g. postgresql+psycopg://...), else a SQLite file at DATABASE_PATH
+DATABASE_PATH = os.getenv("DATABASE_PATH", "./aniphair.db")
+DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///{DATABASE_PATH}"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+# Bookings that hit a locked database are retried with exponential backoff
+BOOKING_MAX_ATTEMPTS = int(os.getenv("BOOKING_MAX_ATTEMPTS", "5"))
+BOOKING_RETRY_BASE_SECONDS = float(os.getenv("BOOKING_RETRY_BASE_SECONDS", "0.05"))
+
+# Groq (LLM + Whisper)
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_TOOL_ROUNDS = int(os.getenv("LLM_MAX_TOOL_ROUNDS", "3"))
+TRANSCRIPTION_TIMEOUT_SECONDS = float(os.getenv("TRANSCRIPTION_TIMEOUT_SECONDS", "60"))
+TRANSCRIPTION_MAX_CONCURRENCY = int(os.getenv("TRANSCRIPTION_MAX_CONCURRENCY", "4"))
+
+# Cache of LLM answers to read-only questions
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+# Salon opening hours per weekday ("mon-fri 09:00-18:00; sat 09:00-12:00,14:00-17:00", unlisted days closed)
+# and granularity of the free-slot search
+OPENING_HOURS = os.getenv("OPENING_HOURS", "mon-sun 09:00-18:00")
+SLOT_GRANULARITY_MINUTES = int(os.getenv("SLOT_GRANULARITY_MINUTES", "15"))
+
+# Per-sender conversation memory: in-memory LRU backed by SQLite, trimmed to a token budget
+CONVERSATION_MAX_ENTRIES = int(os.getenv("CONVERSATION_MAX_ENTRIES", "256"))
+CONVERSATION_TTL_SECONDS = float(os.getenv("CONVERSATION_TTL_SECONDS", "1800"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1500"))
+
+# Hairstyle catalogue: in-process cache (0 = no expiry, invalidated on writes) and HTTP caching
+CATALOGUE_TTL_SECONDS = float(os.getenv("CATALOGUE_TTL_SECONDS", "600"))
+CATALOGUE_MAX_AGE_SECONDS = int(os.getenv("CATALOGUE_MAX_AGE_SECONDS", "300"))
+
+# Speech-to-text backend: "groq" (remote Whisper) or "local" (faster-whisper on CPU)
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "groq")
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "small")
+LOCAL_WHISPER_COMPUTE_TYPE = os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+LOCAL_WHISPER_WORKERS = int(os.getenv("LOCAL_WHISPER_WORKERS", "2"))
+LOCAL_WHISPER_CPU_THREADS = int(os.getenv("LOCAL_WHISPER_CPU_THREADS", "2"))
+
+# Voice note limits, checked before any upload to Whisper
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(16 * 1024 * 1024)))
+AUDIO_MAX_DURATION_SECONDS = int(os.getenv("AUDIO_MAX_DURATION_SECONDS", "600"))
+
+# On-disk cache of Whisper transcriptions, keyed by audio SHA-256
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "1000"))
+
+# Background processing of messages received with ?mode=async
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+AUDIO_STORAGE_DIR = os.getenv("AUDIO_STORAGE_DIR", "./audios")
+# Base URLs that X-Callback-URL may point to (comma-separated); empty disables callbacks
+JOB_CALLBACK_ALLOWED_URLS = [url.strip() for url in os.getenv("JOB_CALLBACK_ALLOWED_URLS", "").split(",") if url.strip()]
+
+# Request tracing: "none", "console" (span tree in the log) or "otlp-file" (OTLP/JSON lines),
+# sampled per trace; incoming W3C traceparent headers keep their sampling decision
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "./traces.jsonl")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "0.1"))
+TRACING_MAX_SPANS = int(os.getenv("TRACING_MAX_SPANS", "500"))
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "aniphair-backend")
+
+# Shared outbound HTTP connection pool
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
@@ -1,20 +1,124 @@
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./aniphair.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+from config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT_SECONDS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
 )
+from services import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # The driver's implicit BEGIN is replaced by _begin_sqlite_transaction
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a webhook is writing; NORMAL is durable enough under WAL
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+
+def _begin_sqlite_transaction(conn):
+    """Emit BEGIN ourselves, so a transaction can take the write lock upfront.
+
+    Connections with the execution option sqlite_begin="IMMEDIATE" start with
+    BEGIN IMMEDIATE (see AppointmentService.reserve); others use a plain BEGIN.
+    """
+    mode = conn.get_execution_options().get("sqlite_begin")
+    conn.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    """Build the SQLAlchemy engine for a SQLite file or a server database such as PostgreSQL."""
+    if url.startswith("sqlite"):
+        if _is_memory_sqlite(url):
+            # In-memory databases live in a single connection and keep SQLAlchemy's default pool
+            return create_engine(url, connect_args={"check_same_thread": False})
+        engine = create_engine(url, connect_args={"check_same_thread": False}, **_pool_options())
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+        event.listen(engine, "begin", _begin_sqlite_transaction)
+    else:
+        engine = create_engine(url, pool_pre_ping=True, pool_recycle=DB_POOL_RECYCLE_SECONDS, **_pool_options())
+    logger.info(f"Database engine: {engine.url.render_as_string(hide_password=True)}")
+    return engine
+
+
+def async_database_url(url: str) -> str:
+    """Swap the driver of a database URL for its asyncio counterpart (aiosqlite, asyncpg)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend == "postgresql":
+        return parsed.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    return url
+
+
+def create_async_db_engine(url: str = DATABASE_URL) -> AsyncEngine:
+    """Async engine used by request handlers and background workers, so queries never block the event loop."""
+    url = async_database_url(url)
+    if url.startswith("sqlite"):
+        if _is_memory_sqlite(url):
+            return create_async_engine(url)
+        engine = create_async_engine(url, **_pool_options())
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        event.listen(engine.sync_engine, "begin", _begin_sqlite_transaction)
+        return engine
+    return create_async_engine(url, pool_pre_ping=True, pool_recycle=DB_POOL_RECYCLE_SECONDS, **_pool_options())
+
+
+# The synchronous engine only runs schema creation, migrations and maintenance scripts
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine()
+# Statement timings for /metrics, and a span per statement in sampled traces
+metrics.instrument_engine(async_engine.sync_engine)
+tracing.instrument_engine(async_engine.sync_engine)
+# Objects stay readable after commit: expiring them would trigger implicit (blocking) reloads
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+
+def init_db():
+    """Create missing tables and apply pending migrations."""
+    import models
+    from migrations import run_migrations
+
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -3,7 +3,9 @@ HAIRSTYLES_SEED = [
         "id": 1,
         "name": "Coiffe Afro",
         "price": "85€",
+        "price_cents": 8500,
         "duration": "4h",
+        "duration_minutes": 240,
         "image": "/images/afro.jpg",
         "category": "Protection"
     },
@@ -11,7 +13,9 @@ HAIRSTYLES_SEED = [
         "id": 2,
         "name": "Nattes Collées",
         "price": "50€",
+        "price_cents": 5000,
         "duration": "2h",
+        "duration_minutes": 120,
         "image": "/images/tresses-collees.jpg",
         "category": "Classique"
     },
@@ -19,7 +23,9 @@ HAIRSTYLES_SEED = [
         "id": 3,
         "name": "Coupe Courte",
         "price": "120€",
+        "price_cents": 12000,
         "duration": "6h",
+        "duration_minutes": 360,
         "image": "/images/courte.jpg",
         "category": "Longue tenue"
     },
@@ -27,7 +33,9 @@ HAIRSTYLES_SEED = [
         "id": 4,
         "name": "Twists Passion",
         "price": "95€",
+        "price_cents": 9500,
         "duration": "3h30",
+        "duration_minutes": 210,
         "image": "/images/large-twists.jpg",
         "category": "Moderne"
     },
@@ -35,7 +43,9 @@ HAIRSTYLES_SEED = [
         "id": 5,
         "name": "Chignon Haut",
         "price": "45€",
+        "price_cents": 4500,
         "duration": "1h",
+        "duration_minutes": 60,
         "image": "/images/chignon.jpg",
         "category": "Événement"
     },
@@ -43,7 +53,9 @@ HAIRSTYLES_SEED = [
         "id": 6,
         "name": "Cheveux Bouclés",
         "price": "65€",
+        "price_cents": 6500,
         "duration": "2h30",
+        "duration_minutes": 150,
         "image": "/images/curly.jpg",
         "category": "Artistique"
     }
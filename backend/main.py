@@ -1,21 +1,34 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import re
 from typing import List
 from contextlib import asynccontextmanager
+import asyncio
 import models
 import schemas
-from database import SessionLocal, engine, get_db
+from database import SessionLocal, async_engine, engine, get_db, init_db
 from initial_data import HAIRSTYLES_SEED
 from routers import whatsapp_router, messages_router
+from services.client_registry import ClientRegistry
+from services import intent_router
+from services.response_cache import response_cache
+from services.catalogue import catalogue
+from services.conversation_memory import conversation_memory
+from services import prompt_builder
+from services.transcription_cache import transcription_cache
+from services.job_queue import JobQueue
+from services import metrics
+from services.tracing import tracer
+from services.notification_dispatcher import NotificationDispatcher, WawpSender
 import config
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Seed database
+    # Startup: create/migrate schema, then seed database
+    init_db()
     db = SessionLocal()
     try:
         if db.query(models.Hairstyle).count() == 0:
@@ -23,10 +36,25 @@ async def lifespan(app: FastAPI):
                 db_style = models.Hairstyle(**style_data)
                 db.add(db_style)
             db.commit()
+            catalogue.invalidate()
     finally:
         db.close()
+
+    # Shared HTTP/2 connection pool for Groq calls
+    app.state.clients = ClientRegistry()
+    # Workers for messages received with ?mode=async
+    app.state.job_queue = JobQueue(app.state.clients)
+    await app.state.job_queue.start()
+    # Outbound WhatsApp notifications, sent from the outbox in the background
+    app.state.notification_dispatcher = NotificationDispatcher(WawpSender(app.state.clients.http_client))
+    await app.state.notification_dispatcher.start()
     yield
-    # Shutdown logic (if any) could go here
+    await app.state.job_queue.stop()
+    # Drain queued notifications while the HTTP pool is still open
+    await app.state.notification_dispatcher.stop()
+    await app.state.clients.aclose()
+    await async_engine.dispose()
+    await asyncio.to_thread(tracer.flush)
 
 app = FastAPI(title="Anip Hair API", lifespan=lifespan)
 
@@ -39,6 +67,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latency histograms and database statements per route, exposed on /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(whatsapp_router.router)
 app.include_router(messages_router.router)
 
@@ -47,9 +78,37 @@ app.include_router(messages_router.router)
 async def health_check():
     return {"status": "ok", "message": "Anip Hair Backend is running with SQLite persistence"}
 
+@app.get("/stats")
+async def get_stats():
+    return {
+        "http_pool": app.state.clients.stats(),
+        "intent_router": intent_router.stats(),
+        "response_cache": response_cache.stats(),
+        "catalogue": catalogue.stats(),
+        "prompt": prompt_builder.stats(),
+        "transcription_cache": await transcription_cache.stats(),
+        "conversations": await conversation_memory.stats(),
+        "job_queue": await app.state.job_queue.stats(),
+        "notifications": await app.state.notification_dispatcher.stats(),
+        "tracing": tracer.stats(),
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/hairstyles", response_model=List[schemas.Hairstyle])
-async def get_hairstyles(db: Session = Depends(get_db)):
-    return db.query(models.Hairstyle).all()
+async def get_hairstyles(request: Request, db: AsyncSession = Depends(get_db)):
+    # Catalogue servi depuis le cache mémoire, avec validateurs HTTP pour les navigateurs/CDN
+    snapshot = await catalogue.get(db)
+    headers = {
+        "ETag": snapshot.etag,
+        "Last-Modified": snapshot.last_modified_http,
+        "Cache-Control": f"public, max-age={config.CATALOGUE_MAX_AGE_SECONDS}, must-revalidate",
+    }
+    if snapshot.not_modified(request.headers.get("If-None-Match"), request.headers.get("If-Modified-Since")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 
 
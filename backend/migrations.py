@@ -0,0 +1,145 @@
+"""Idempotent schema upgrades for databases created before a column or index existed.
+
+`Base.metadata.create_all` only creates missing tables, so columns and indexes added
+to existing models are applied here at startup.
+"""
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+import models
+from initial_data import HAIRSTYLES_SEED
+from services.appointment_service import compute_end_at, parse_duration_minutes, parse_price_cents
+
+logger = logging.getLogger(__name__)
+
+
+def _add_missing_columns(engine: Engine, table, columns: list):
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for name in columns:
+            if name not in existing:
+                # Column type rendered for the current dialect (DATETIME on SQLite, TIMESTAMP on PostgreSQL)
+                ddl = table.c[name].type.compile(dialect=engine.dialect)
+                logger.info(f"Adding column {table.name}.{name}")
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {ddl}"))
+
+
+def _create_missing_indexes(engine: Engine, table):
+    with engine.begin() as conn:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _drop_obsolete_indexes(engine: Engine, table, names: list):
+    existing = {i["name"] for i in inspect(engine).get_indexes(table.name)}
+    with engine.begin() as conn:
+        for name in names:
+            if name in existing:
+                logger.info(f"Dropping index {name}")
+                conn.execute(text(f"DROP INDEX {name}"))
+
+
+def _backfill_end_at(engine: Engine):
+    with Session(engine) as db:
+        pending = db.query(models.Appointment).filter(models.Appointment.end_at.is_(None)).all()
+        for appt in pending:
+            appt.end_at = compute_end_at(appt.date, appt.style)
+        if pending:
+            logger.info(f"Backfilled end_at for {len(pending)} appointments")
+            db.commit()
+
+
+def _backfill_hairstyle_numbers(engine: Engine):
+    # Seeded styles take their canonical values; custom rows are parsed from the text form
+    seed = {(s["id"], s["name"]): s for s in HAIRSTYLES_SEED}
+    with Session(engine) as db:
+        pending = (
+            db.query(models.Hairstyle)
+            .filter((models.Hairstyle.duration_minutes.is_(None)) | (models.Hairstyle.price_cents.is_(None)))
+            .all()
+        )
+        for style in pending:
+            known = seed.get((style.id, style.name), {})
+            if style.duration_minutes is None:
+                if known.get("duration") == style.duration:
+                    style.duration_minutes = known.get("duration_minutes")
+                else:
+                    style.duration_minutes = parse_duration_minutes(style.duration)
+            if style.price_cents is None:
+                if known.get("price") == style.price:
+                    style.price_cents = known.get("price_cents")
+                else:
+                    style.price_cents = parse_price_cents(style.price)
+        if pending:
+            logger.info(f"Backfilled duration_minutes/price_cents for {len(pending)} hairstyles")
+            db.commit()
+
+
+def _backfill_short_codes(engine: Engine):
+    # Existing rows keep the 8 first characters of their ID, as the bot displayed them so far
+    with Session(engine) as db:
+        pending = db.query(models.Appointment).filter(models.Appointment.short_code.is_(None)).all()
+        taken = {code for (code,) in db.query(models.Appointment.short_code).filter(models.Appointment.short_code.isnot(None))}
+        for appt in pending:
+            code = appt.id[:models.SHORT_CODE_LENGTH]
+            while code in taken:
+                code = models.new_short_code()
+            appt.short_code = code
+            taken.add(code)
+        if pending:
+            logger.info(f"Backfilled short_code for {len(pending)} appointments")
+            db.commit()
+
+
+# Full-text index on customer names (SQLite FTS5). It stores the appointment ID
+# rather than relying on rowids, which VACUUM may renumber on a table keyed by a
+# string. Name changes and deletions are rare, so their triggers may scan.
+_FTS_DDL = [
+    """CREATE VIRTUAL TABLE appointments_fts USING fts5(
+        customer_name, appointment_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS appointments_fts_insert AFTER INSERT ON appointments BEGIN
+        INSERT INTO appointments_fts (customer_name, appointment_id) VALUES (new.customer_name, new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS appointments_fts_update AFTER UPDATE OF customer_name ON appointments BEGIN
+        UPDATE appointments_fts SET customer_name = new.customer_name WHERE appointment_id = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS appointments_fts_delete AFTER DELETE ON appointments BEGIN
+        DELETE FROM appointments_fts WHERE appointment_id = old.id;
+    END""",
+]
+
+
+def create_customer_name_fts(conn: Connection):
+    """Create and fill the FTS5 index of customer names on SQLite (no-op elsewhere or if present)."""
+    if conn.dialect.name != "sqlite":
+        return
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'appointments_fts'"
+    )).first()
+    if exists:
+        return
+    for ddl in _FTS_DDL:
+        conn.execute(text(ddl))
+    filled = conn.execute(text(
+        "INSERT INTO appointments_fts (customer_name, appointment_id) SELECT customer_name, id FROM appointments"
+    )).rowcount
+    logger.info(f"Created appointments_fts ({filled} names indexed)")
+
+
+def run_migrations(engine: Engine):
+    hairstyles = models.Hairstyle.__table__
+    _add_missing_columns(engine, hairstyles, ["price_cents", "duration_minutes"])
+    _backfill_hairstyle_numbers(engine)
+
+    appointments = models.Appointment.__table__
+    _add_missing_columns(engine, appointments, ["end_at", "short_code"])
+    _backfill_short_codes(engine)
+    # Superseded by ix_appointments_date_id_end_at_status
+    _drop_obsolete_indexes(engine, appointments, ["ix_appointments_date_end_at_status"])
+    _create_missing_indexes(engine, appointments)
+    _backfill_end_at(engine)
+    with engine.begin() as conn:
+        create_customer_name_fts(conn)
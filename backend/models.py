@@ -1,16 +1,35 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, Boolean
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import secrets
 import uuid
 from database import Base
 
+# Short appointment codes shown to the admin (CONFIRM/CANCEL): no 0/o, 1/l/i to misread
+SHORT_CODE_ALPHABET = "23456789abcdefghjkmnpqrstuvwxyz"
+SHORT_CODE_LENGTH = 8
+
+
+def new_short_code() -> str:
+    """Random code with at least one digit, so the intent router can tell it from a word.
+
+    Codes without a digit (about 9%) are drawn again, which keeps the choice uniform.
+    """
+    while True:
+        code = "".join(secrets.choice(SHORT_CODE_ALPHABET) for _ in range(SHORT_CODE_LENGTH))
+        if any(char.isdigit() for char in code):
+            return code
+
+
 class Hairstyle(Base):
     __tablename__ = "hairstyles"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     price = Column(String)
+    price_cents = Column(Integer, nullable=True)
     duration = Column(String)
+    duration_minutes = Column(Integer, nullable=True)
     image = Column(String)
     category = Column(String)
 
@@ -20,16 +39,26 @@ class Appointment(Base):
     __tablename__ = "appointments"
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    short_code = Column(String(SHORT_CODE_LENGTH), unique=True, index=True, default=new_short_code)
     style_id = Column(Integer, ForeignKey("hairstyles.id"))
     customer_name = Column(String)
     telephone = Column(String)
     date = Column(DateTime)
+    end_at = Column(DateTime, nullable=True)
     notes = Column(Text, nullable=True)
     status = Column(String, default="pending")
     created_at = Column(DateTime, default=datetime.now)
 
     style = relationship("Hairstyle", back_populates="appointments")
 
+    __table_args__ = (
+        # Ordered (date, id) for keyset pagination; end_at/status let overlap checks filter in the index
+        Index("ix_appointments_date_id_end_at_status", "date", "id", "end_at", "status"),
+        # Listing API filtered by style or status, still ordered by (date, id)
+        Index("ix_appointments_style_id_date_id", "style_id", "date", "id"),
+        Index("ix_appointments_status_date_id", "status", "date", "id"),
+    )
+
 class WhatsAppSession(Base):
     __tablename__ = "whatsapp_sessions"
 
@@ -38,3 +67,63 @@ class WhatsAppSession(Base):
     status = Column(String, default="DISCONNECTED") # DISCONNECTED, CONNECTING, CONNECTED
     qr_code = Column(Text, nullable=True)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class Transcription(Base):
+    __tablename__ = "transcriptions"
+
+    sha256 = Column(String(64), primary_key=True)
+    text = Column(Text)
+    audio_size = Column(Integer)
+    created_at = Column(DateTime, default=datetime.now)
+    last_used_at = Column(DateTime, default=datetime.now, index=True)
+
+class Conversation(Base):
+    __tablename__ = "conversations"
+
+    sender_id = Column(String, primary_key=True)
+    turns = Column(Text, default="[]")  # JSON list of {"user", "assistant", "tokens"}
+    tokens = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.now, index=True)
+
+class OutboundMessage(Base):
+    __tablename__ = "outbound_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(String, index=True)
+    text = Column(Text)
+    topic = Column(String, nullable=True)  # messages of the same topic and chat may be sent as one digest
+    status = Column(String, default="queued")  # queued, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_run_at = Column(DateTime, default=datetime.now)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbound_messages_status_next_run_at", "status", "next_run_at"),
+    )
+
+class MessageJob(Base):
+    __tablename__ = "message_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)  # monotonic, gives per-sender ordering
+    idempotency_key = Column(String, unique=True, index=True, nullable=True)
+    sender_id = Column(String, index=True)
+    type = Column(String)  # text, audio
+    message = Column(Text, nullable=True)
+    audio_path = Column(String, nullable=True)
+    audio_filename = Column(String, nullable=True)
+    audio_digest = Column(String(64), nullable=True)
+    callback_url = Column(String, nullable=True)
+    status = Column(String, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    next_run_at = Column(DateTime, default=datetime.now)
+    reply = Column(Text, nullable=True)
+    delivered = Column(Boolean, default=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index("ix_message_jobs_status_next_run_at", "status", "next_run_at"),
+    )
@@ -1,22 +1,61 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from services.messages_service import MessagesService
+from services.client_registry import ClientRegistry, get_clients
+from services.audio_ingest import AudioRejected, ingest_upload
+from services.job_queue import JobQueue, callback_allowed, get_job_queue
+from services.tracing import tracer
+import models
 import schemas
 import os
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
+
+def _wants_async(request: Request) -> bool:
+    """Asynchronous processing is requested with ?mode=async or `Prefer: respond-async`."""
+    return (
+        request.query_params.get("mode") == "async"
+        or "respond-async" in request.headers.get("Prefer", "")
+    )
+
+
+def _accepted(job, created: bool) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={"status": "accepted", "job_id": job.id, "job_status": job.status, "duplicate": not created},
+        headers={"Location": f"/messages/jobs/{job.id}"},
+    )
+
+
+async def trace_receive(request: Request):
+    """Root span of the request: transcription, completions, tool calls and SQL are nested under it."""
+    with tracer.start_trace("messages.receive", traceparent=request.headers.get("traceparent"),
+                            **{"http.route": "/messages/receive"}) as span:
+        yield span
+
+
 @router.post("/receive")
 async def receive_message(
     request: Request,
     type: str = Form(None),
     sender_id: str = Form(None),
     file: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    clients: ClientRegistry = Depends(get_clients),
+    job_queue: JobQueue = Depends(get_job_queue),
+    span = Depends(trace_receive)
 ):
-    service = MessagesService(db)
+    service = MessagesService(db, llm_client=clients.groq, transcriber=clients.transcription)
+    async_mode = _wants_async(request)
+    span.set_attribute("messages.async", async_mode)
+    idempotency_key = request.headers.get("Idempotency-Key")
+    callback_url = request.headers.get("X-Callback-URL")
+    if callback_url and not callback_allowed(callback_url):
+        raise HTTPException(status_code=400, detail="X-Callback-URL is not an allowed callback address")
     
     # Check if it's a JSON request (text message)
     content_type = request.headers.get("Content-Type", "")
@@ -26,8 +65,13 @@ async def receive_message(
         msg_type = data.get("type")
         message = data.get("message")
         sender = data.get("sender_id")
+        span.set_attribute("message.type", msg_type or "text")
         
         print(f"📩 Message texte reçu de {sender}: {message}")
+
+        if async_mode:
+            job, created = await job_queue.enqueue_text(db, sender, message, idempotency_key, callback_url)
+            return _accepted(job, created)
         
         # Process with service
         reply = await service.process_message(message, sender)
@@ -40,12 +84,21 @@ async def receive_message(
 
     # Handle Multi-part/Form-Data (audio message)
     if type == "audio" and file:
-        content = await file.read()
+        span.set_attribute("message.type", "audio")
+        # Lecture par blocs du fichier déjà spoolé par Starlette (limites taille/durée)
+        try:
+            audio = await ingest_upload(file)
+        except AudioRejected as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
-        print(f"🎵 Audio reçu de {sender_id} (taille: {len(content)} bytes)")
+        print(f"🎵 Audio reçu de {sender_id} (taille: {audio.size} bytes, tampon de lecture estimé: {audio.peak_buffer_bytes} bytes)")
+
+        if async_mode:
+            job, created = await job_queue.enqueue_audio(db, sender_id, audio, idempotency_key, callback_url)
+            return _accepted(job, created)
         
         # Process audio with service
-        reply = await service.process_audio_message(content, file.filename or "audio.ogg", sender_id)
+        reply = await service.process_audio_message(audio.file, audio.filename, sender_id, digest=audio.digest)
         
         return {
             "status": "success", 
@@ -55,6 +108,13 @@ async def receive_message(
 
     raise HTTPException(status_code=400, detail="Invalid request format or type")
 
+@router.get("/jobs/{job_id}", response_model=schemas.MessageJob)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    job = await db.get(models.MessageJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.get("/status")
 async def get_status():
     return {"status": "active"}
\ No newline at end of file
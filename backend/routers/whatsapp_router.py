@@ -1,18 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from database import get_db
+import json
+import logging
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, get_db
 from schemas import AppointmentCreate, Appointment, WhatsAppMessageSend, WhatsAppMessage
-from typing import List
-from datetime import timedelta, timezone
-import re
+from typing import List, Optional, Tuple
 import models
 from config import ADMIN_PHONE_NUMBER
+from services.appointment_service import (
+    LISTING_FIELDS,
+    AppointmentService,
+    compute_end_at,
+    decode_cursor,
+    encode_cursor,
+    to_naive_utc,
+)
+from services.notification_dispatcher import NotificationDispatcher, get_notification_dispatcher
+from services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
 
+# Rows fetched per query while streaming an NDJSON export
+EXPORT_BATCH_SIZE = 500
+
 # WhatsApp Management Endpoints
 @router.post("/session/start")
-async def start_session(db: Session = Depends(get_db)):
+async def start_session(db: AsyncSession = Depends(get_db)):
     service = WhatsAppSessionService(db)
     result = await service.start_session()
     if isinstance(result, dict) and "error" in result:
@@ -20,7 +38,7 @@ async def start_session(db: Session = Depends(get_db)):
     return result
 
 @router.post("/session/stop")
-async def stop_session(db: Session = Depends(get_db)):
+async def stop_session(db: AsyncSession = Depends(get_db)):
     service = WhatsAppSessionService(db)
     result = await service.stop_session()
     
@@ -28,95 +46,125 @@ async def stop_session(db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=result.get("detail", result["error"]))
     return {"status": "success", "result": result}
 
-def parse_duration(duration_str: str) -> timedelta:
-    """Parse duration string like '4h' or '3h30' into timedelta."""
-    match = re.match(r"(\d+)h(?:(\d+))?", duration_str)
-    if not match:
-        return timedelta(hours=2)  # Default
-    hours = int(match.group(1))
-    minutes = int(match.group(2)) if match.group(2) else 0
-    return timedelta(hours=hours, minutes=minutes)
-
 @router.post("/appointments", response_model=Appointment)
-async def create_appointment(appointment_in: AppointmentCreate, db: Session = Depends(get_db)):
+async def create_appointment(
+    appointment_in: AppointmentCreate,
+    db: AsyncSession = Depends(get_db),
+    notifications: NotificationDispatcher = Depends(get_notification_dispatcher),
+):
     # Check if hairstyle exists
-    style = db.query(models.Hairstyle).filter(models.Hairstyle.id == appointment_in.style_id).first()
+    style = await db.get(models.Hairstyle, appointment_in.style_id)
     if not style:
         raise HTTPException(status_code=404, detail="Hairstyle not found")
     
-    # Calculate end time
-    duration = parse_duration(style.duration)
-    start_time = appointment_in.date
-    
-    # Normaliser la timezone si nécessaire
-    if start_time.tzinfo is None:
-        # Si start_time est naive, on le rend aware (UTC par exemple)
-        from datetime import timezone
-        start_time = start_time.replace(tzinfo=timezone.utc)
-    
-    end_time = start_time + duration
-    
-    # Check for overlaps - version simplifiée
-    existing_appointments = db.query(models.Appointment, models.Hairstyle).\
-        join(models.Hairstyle, models.Appointment.style_id == models.Hairstyle.id).\
-        all()
-    
-    for appt, appt_style in existing_appointments:
-        appt_start = appt.date
-        
-        # Normaliser la timezone de l'appointment existant
-        if appt_start.tzinfo is None:
-            from datetime import timezone
-            appt_start = appt_start.replace(tzinfo=timezone.utc)
-        
-        appt_duration = parse_duration(appt_style.duration)
-        appt_end = appt_start + appt_duration
-        
-        # Vérifier le chevauchement
-        if (appt_start < end_time) and (appt_end > start_time):
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Créneau déjà occupé par '{appt_style.name}' jusqu'à {appt_end.strftime('%H:%M')}"
-            )
+    # Les dates sont stockées en UTC naïf (une date naïve est considérée comme UTC)
+    start_time = to_naive_utc(appointment_in.date)
+    end_time = compute_end_at(start_time, style)
     
-    # Create appointment
-    db_appointment = models.Appointment(**appointment_in.model_dump())
-    db.add(db_appointment)
-    db.commit()
-    db.refresh(db_appointment)
+    # Vérification des chevauchements et insertion dans une même transaction verrouillée
+    db_appointment = models.Appointment(
+        **appointment_in.model_dump(exclude={"date"}),
+        date=start_time,
+        end_at=end_time,
+    )
+    # Our read transaction would keep a pooled connection while the reservation takes another
+    await db.commit()
+    appt, booked = await AppointmentService.reserve(AsyncSessionLocal, db_appointment)
+    if not booked:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Créneau déjà occupé par '{appt.style.name if appt.style else 'N/A'}' jusqu'à {appt.end_at.strftime('%H:%M')}"
+        )
+    response_cache.invalidate_day(start_time)
     
-    # Notify Admin (optionnel - en arrière-plan)
+    # Notify Admin (optionnel - via l'outbox, envoyé en arrière-plan et regroupé en rafale)
     if ADMIN_PHONE_NUMBER:
         try:
-            whatsapp_service = WhatsAppSessionService(db)
             msg = (
                 f"🔔 *Nouvelle Réservation*\n"
                 f"👤 Client: {db_appointment.customer_name}\n"
                 f"💇 Prestation: {style.name}\n"
                 f"📅 Date: {db_appointment.date.strftime('%d/%m/%Y à %H:%M')}\n"
                 f"📞 Tel: {db_appointment.telephone}\n"
-                f"🆔 ID: {db_appointment.id[:8]}"
+                f"🆔 ID: {db_appointment.short_code}"
             )
-            # Envoi asynchrone sans bloquer
-            import asyncio
-            asyncio.create_task(whatsapp_service.send_message(
-                chat_id=ADMIN_PHONE_NUMBER,
-                text=msg
-            ))
+            await notifications.notify(db, ADMIN_PHONE_NUMBER, msg, topic="booking")
         except Exception as e:
-            print(f"Notification WhatsApp échouée: {e}")
+            logger.warning(f"Admin notification for appointment {db_appointment.short_code} could not be queued: {e}")
 
     return db_appointment
 
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return LISTING_FIELDS
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in LISTING_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(LISTING_FIELDS)}")
+    return requested
+
+
+def _project(row: dict, fields: Tuple[str, ...]) -> dict:
+    return jsonable_encoder({name: row[name] for name in fields})
+
+
+async def _export_ndjson(filters: dict, after, fields: Tuple[str, ...]):
+    # Own session: the request-scoped one may be closed while the body is still streaming
+    async with AsyncSessionLocal() as db:
+        service = AppointmentService(db)
+        while True:
+            rows = await service.list_page(**filters, after=after, limit=EXPORT_BATCH_SIZE, fields=fields)
+            if not rows:
+                return
+            yield "".join(json.dumps(_project(row, fields), ensure_ascii=False) + "\n" for row in rows)
+            if len(rows) < EXPORT_BATCH_SIZE:
+                return
+            after = (rows[-1]["date"], rows[-1]["id"])
+
+
 @router.get("/appointments", response_model=List[Appointment])
-async def list_appointments(db: Session = Depends(get_db)):
-    return db.query(models.Appointment).all()
+async def list_appointments(
+    request: Request,
+    response: Response,
+    from_: Optional[datetime] = Query(None, alias="from", description="Début inclus de la fenêtre (date du RDV)"),
+    to: Optional[datetime] = Query(None, description="Fin exclue de la fenêtre"),
+    status: Optional[str] = Query(None),
+    style_id: Optional[int] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Valeur de X-Next-Cursor de la page précédente"),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Liste paginée (keyset sur date, id) ; la page suivante est indiquée par X-Next-Cursor et Link."""
+    projection = _parse_fields(fields)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filters = {"start": from_, "end": to, "status": status, "style_id": style_id}
+
+    # Export complet en NDJSON, lu par lots sans tout charger en mémoire
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get("Accept", ""):
+        return StreamingResponse(_export_ndjson(filters, after, projection), media_type="application/x-ndjson")
+
+    rows = await AppointmentService(db).list_page(**filters, after=after, limit=limit, fields=projection)
+    headers = {}
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1]["date"], rows[-1]["id"])
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    if projection == LISTING_FIELDS:
+        response.headers.update(headers)
+        return rows
+    # Projection partielle : pas de validation par le schéma complet
+    return JSONResponse([_project(row, projection) for row in rows], headers=headers)
 
 
 @router.post("/send")
 async def send_whatsapp_message(
     msg_in: WhatsAppMessageSend, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     service = WhatsAppSessionService(db)
     result = await service.send_message(
@@ -6,7 +6,9 @@ from typing import List, Optional
 class HairstyleBase(BaseModel):
     name: str
     price: str
+    price_cents: Optional[int] = None
     duration: str
+    duration_minutes: Optional[int] = None
     image: str
     category: str
 
@@ -27,6 +29,8 @@ class AppointmentCreate(AppointmentBase):
 
 class Appointment(AppointmentBase):
     id: str
+    short_code: Optional[str] = None
+    end_at: Optional[datetime] = None
     created_at: datetime
     status: str
     model_config = ConfigDict(from_attributes=True)
@@ -45,3 +49,13 @@ class WhatsAppMessageReceive(BaseModel):
     message: Optional[str] = None
     sender_id: str
 
+class MessageJob(BaseModel):
+    id: int
+    sender_id: str
+    type: str
+    status: str
+    attempts: int
+    reply: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    model_config = ConfigDict(from_attributes=True)
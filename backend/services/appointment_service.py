@@ -0,0 +1,301 @@
+import asyncio
+import base64
+import logging
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Select, func, literal_column, select, text, tuple_
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload
+
+import models
+from config import BOOKING_MAX_ATTEMPTS, BOOKING_RETRY_BASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DURATION = timedelta(hours=2)
+
+# Upper bound on the length of a single appointment. find_conflicts relies on it
+# to turn the overlap test into a bounded range scan on the (date, id, end_at, status) index.
+MAX_APPOINTMENT_SPAN = timedelta(hours=24)
+
+# First key of the PostgreSQL advisory locks taken per booked day (the second is the day ordinal)
+BOOKING_LOCK_NAMESPACE = 0x414E4950
+
+# SQLSTATEs of serialization failures and deadlocks, worth retrying on PostgreSQL
+_RETRYABLE_SQLSTATES = ("40001", "40P01")
+
+# Columns that can be requested through the listing API `fields` projection
+LISTING_FIELDS = ("id", "short_code", "style_id", "customer_name", "telephone", "date", "end_at", "notes", "status", "created_at")
+
+
+def parse_duration(duration_str: Optional[str]) -> timedelta:
+    """Parse duration string like '4h' or '3h30' into timedelta."""
+    if not duration_str:
+        return DEFAULT_DURATION
+    match = re.match(r"(\d+)h(?:(\d+))?", duration_str)
+    if not match:
+        return DEFAULT_DURATION
+    hours = int(match.group(1))
+    minutes = int(match.group(2)) if match.group(2) else 0
+    return timedelta(hours=hours, minutes=minutes)
+
+
+def parse_duration_minutes(duration_str: Optional[str]) -> Optional[int]:
+    """Parse a duration string like '3h30' into minutes, or None if it cannot be read."""
+    if not duration_str or not re.match(r"(\d+)h", duration_str):
+        return None
+    return int(parse_duration(duration_str).total_seconds() // 60)
+
+
+def parse_price_cents(price_str: Optional[str]) -> Optional[int]:
+    """Parse a price string like '85€' or '12,50 €' into cents, or None if it cannot be read."""
+    if not price_str:
+        return None
+    match = re.search(r"(\d+)(?:[.,](\d{1,2}))?", price_str)
+    if not match:
+        return None
+    cents = (match.group(2) or "0").ljust(2, "0")
+    return int(match.group(1)) * 100 + int(cents)
+
+
+def style_duration(style: Optional[models.Hairstyle]) -> timedelta:
+    """Duration of a hairstyle, from duration_minutes when set, else from the text form."""
+    if style is None:
+        return DEFAULT_DURATION
+    if style.duration_minutes:
+        return timedelta(minutes=style.duration_minutes)
+    return parse_duration(style.duration)
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Normalize a datetime to the naive UTC form stored in the database."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def compute_end_at(start: datetime, style: Optional[models.Hairstyle]) -> datetime:
+    """Compute the stored end of an appointment from its start and hairstyle."""
+    return start + min(style_duration(style), MAX_APPOINTMENT_SPAN)
+
+
+def _is_retryable(error: DBAPIError) -> bool:
+    return "database is locked" in str(error.orig) or getattr(error.orig, "sqlstate", None) in _RETRYABLE_SQLSTATES
+
+
+def encode_cursor(date: datetime, appointment_id: str) -> str:
+    """Opaque keyset cursor pointing just after the (date, id) of the last row returned."""
+    raw = f"{date.isoformat()}|{appointment_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date, appointment_id = raw.split("|", 1)
+        return datetime.fromisoformat(date), appointment_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class AppointmentService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def find_conflicts(self, start: datetime, end: datetime) -> List[models.Appointment]:
+        """Return the active appointments overlapping the [start, end) interval."""
+        result = await self.db.execute(self._conflicts_query(start, end))
+        return list(result.scalars().all())
+
+    @staticmethod
+    def _conflicts_query(start: datetime, end: datetime) -> Select:
+        start = to_naive_utc(start)
+        end = to_naive_utc(end)
+        return (
+            select(models.Appointment)
+            .options(joinedload(models.Appointment.style))
+            .where(models.Appointment.date > start - MAX_APPOINTMENT_SPAN)
+            .where(models.Appointment.date < end)
+            .where(models.Appointment.end_at > start)
+            .where(models.Appointment.status != "canceled")
+            .order_by(models.Appointment.date)
+        )
+
+    @staticmethod
+    async def reserve(session_factory: async_sessionmaker,
+                      appointment: models.Appointment) -> Tuple[models.Appointment, bool]:
+        """Insert the appointment unless it overlaps an active one, as one atomic step.
+
+        Returns (appointment, True) once the new row is committed, or (the first
+        conflicting appointment, False). Both are detached, readable rows; callers
+        merge them into their own session if they need to. The work runs in a
+        session of `session_factory`, in a write transaction that holds the lock
+        from the start (BEGIN IMMEDIATE on SQLite, advisory locks on the booked
+        days on PostgreSQL), so two concurrent bookings of the same slot cannot
+        both pass the check. Lock timeouts are retried with backoff.
+        """
+        for attempt in range(1, BOOKING_MAX_ATTEMPTS + 1):
+            async with session_factory(autoflush=False, expire_on_commit=False) as session:
+                try:
+                    conn = await session.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+                    if conn.dialect.name == "postgresql":
+                        await self._lock_days(session, appointment.date, appointment.end_at)
+                    conflicts = await AppointmentService(session).find_conflicts(appointment.date, appointment.end_at)
+                    if conflicts:
+                        # Closing the session ends the transaction without expiring the rows read
+                        return conflicts[0], False
+                    session.add(appointment)
+                    await session.commit()
+                    booked = True
+                except IntegrityError as e:
+                    await session.rollback()
+                    if "short_code" not in str(e.orig) or attempt == BOOKING_MAX_ATTEMPTS:
+                        raise
+                    # Random short codes collide once in a long while: draw another one
+                    appointment.short_code = models.new_short_code()
+                    booked, delay = False, 0
+                except DBAPIError as e:
+                    await session.rollback()
+                    if not _is_retryable(e) or attempt == BOOKING_MAX_ATTEMPTS:
+                        raise
+                    booked = False
+                    delay = BOOKING_RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                    logger.warning(f"Booking attempt {attempt} hit a lock ({e.orig}), retrying in {delay:.2f}s")
+            if booked:
+                return appointment, True
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _lock_days(session: AsyncSession, start: datetime, end: datetime):
+        """Lock every day the appointment touches, in order; overlapping bookings share at least one."""
+        day = start.date()
+        while day <= end.date():
+            await session.execute(select(func.pg_advisory_xact_lock(BOOKING_LOCK_NAMESPACE, day.toordinal())))
+            day += timedelta(days=1)
+
+    async def busy_intervals(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """(start, end) of the active appointments overlapping [start, end), sorted by start.
+
+        Reads only date and end_at, which the (date, id, end_at, status) index covers.
+        """
+        table = models.Appointment.__table__
+        result = await self.db.execute(
+            select(table.c.date, table.c.end_at)
+            .where(table.c.date > to_naive_utc(start) - MAX_APPOINTMENT_SPAN)
+            .where(table.c.date < to_naive_utc(end))
+            .where(table.c.end_at > to_naive_utc(start))
+            .where(table.c.status != "canceled")
+            .order_by(table.c.date)
+        )
+        return [(row.date, row.end_at) for row in result]
+
+    async def list_appointments(self, start: datetime, end: Optional[datetime] = None,
+                                include_canceled: bool = False) -> List[models.Appointment]:
+        """Return the appointments starting in [start, end), ordered by date, with their style loaded.
+
+        The hairstyle comes from the same SELECT (LEFT OUTER JOIN), so callers can
+        read appt.style without one extra query per row.
+        """
+        query = (
+            select(models.Appointment)
+            .options(joinedload(models.Appointment.style))
+            .where(models.Appointment.date >= start)
+        )
+        if end is not None:
+            query = query.where(models.Appointment.date < end)
+        if not include_canceled:
+            query = query.where(models.Appointment.status != "canceled")
+        result = await self.db.execute(query.order_by(models.Appointment.date))
+        return list(result.scalars().all())
+
+    async def find_by_short_code(self, code: str, active_only: bool = False) -> Optional[models.Appointment]:
+        """Return the appointment with this short code, one whose code starts with it, or with this full ID."""
+        code = code.strip().lower()
+        if not code:
+            return None
+        short_code = models.Appointment.short_code
+        if len(code) == models.SHORT_CODE_LENGTH:
+            query = select(models.Appointment).where(short_code == code)
+        elif len(code) < models.SHORT_CODE_LENGTH:
+            # A range on the unique index: SQLite's case-insensitive LIKE cannot use it
+            query = select(models.Appointment).where(short_code >= code, short_code < code + "\x7f")
+        else:
+            query = select(models.Appointment).where(models.Appointment.id == code)
+        if active_only:
+            query = query.where(models.Appointment.status != "canceled")
+        result = await self.db.execute(query.limit(1))
+        return result.scalars().first()
+
+    async def find_by_customer_name(self, name: str, active_only: bool = False) -> Optional[models.Appointment]:
+        """Return the latest appointment of a customer whose name contains every word of `name`.
+
+        On SQLite this goes through the appointments_fts index (word prefixes,
+        accents ignored); other databases fall back to a substring match.
+        """
+        words = re.findall(r"\w+", name)
+        if not words:
+            return None
+        query = select(models.Appointment)
+        if self.db.bind.dialect.name == "sqlite":
+            match = " ".join(f'"{word}"*' for word in words)
+            matching_ids = (
+                select(literal_column("appointment_id"))
+                .select_from(text("appointments_fts"))
+                .where(text("appointments_fts MATCH :match").bindparams(match=match))
+            )
+            query = query.where(models.Appointment.id.in_(matching_ids))
+        else:
+            query = query.where(models.Appointment.customer_name.ilike(f"%{name.strip()}%"))
+        if active_only:
+            query = query.where(models.Appointment.status != "canceled")
+        result = await self.db.execute(query.order_by(models.Appointment.date.desc()).limit(1))
+        return result.scalars().first()
+
+    async def list_page(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        status: Optional[str] = None,
+        style_id: Optional[int] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        limit: int = 100,
+        fields: Sequence[str] = LISTING_FIELDS,
+    ) -> List[Dict[str, Any]]:
+        """Return one page of appointments ordered by (date, id), as plain dicts of the requested columns.
+
+        Pagination is keyset-based: `after` is the (date, id) of the last row of the
+        previous page, so every page is an index range scan whatever its depth.
+        Only the projected columns are selected; date and id are always included
+        for the next cursor.
+        """
+        result = await self.db.execute(self._page_query(start, end, status, style_id, after, limit, fields))
+        return [dict(row) for row in result.mappings().all()]
+
+    @staticmethod
+    def _page_query(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        status: Optional[str] = None,
+        style_id: Optional[int] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+        limit: int = 100,
+        fields: Sequence[str] = LISTING_FIELDS,
+    ) -> Select:
+        table = models.Appointment.__table__
+        columns = dict.fromkeys(("date", "id", *fields))
+        query = select(*(table.c[name] for name in columns))
+        if start is not None:
+            query = query.where(table.c.date >= to_naive_utc(start))
+        if end is not None:
+            query = query.where(table.c.date < to_naive_utc(end))
+        if status is not None:
+            query = query.where(table.c.status == status)
+        if style_id is not None:
+            query = query.where(table.c.style_id == style_id)
+        if after is not None:
+            query = query.where(tuple_(table.c.date, table.c.id) > tuple_(*after))
+        return query.order_by(table.c.date, table.c.id).limit(limit)
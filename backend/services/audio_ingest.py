@@ -0,0 +1,96 @@
+import hashlib
+import logging
+import resource
+import struct
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+
+from config import AUDIO_MAX_BYTES, AUDIO_MAX_DURATION_SECONDS
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# The last Ogg page (holding the final granule position) sits within the file tail
+OGG_TAIL_BYTES = 64 * 1024
+
+
+class AudioRejected(ValueError):
+    """Raised when an upload exceeds the configured size or duration limits."""
+
+
+class IngestedAudio:
+    def __init__(self, file: BinaryIO, filename: str, size: int, digest: str,
+                 duration: Optional[float], peak_buffer_bytes: int):
+        self.file = file
+        self.filename = filename
+        self.size = size
+        self.digest = digest
+        self.duration = duration
+        self.peak_buffer_bytes = peak_buffer_bytes
+
+
+def ogg_duration_seconds(file: BinaryIO) -> Optional[float]:
+    """Read the duration of an Ogg Opus/Vorbis stream from its headers, or None if unknown."""
+    file.seek(0)
+    head = file.read(128)
+    if not head.startswith(b"OggS"):
+        return None
+    if b"OpusHead" in head:
+        sample_rate = 48000  # Opus granule positions always count 48 kHz samples
+    elif b"\x01vorbis" in head:
+        offset = head.index(b"\x01vorbis") + 12
+        sample_rate = struct.unpack_from("<I", head, offset)[0]
+    else:
+        return None
+
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(max(0, size - OGG_TAIL_BYTES))
+    tail = file.read()
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0 or last_page + 14 > len(tail) or not sample_rate:
+        return None
+    granule = struct.unpack_from("<q", tail, last_page + 6)[0]
+    return granule / sample_rate if granule > 0 else None
+
+
+async def ingest_upload(upload: UploadFile) -> IngestedAudio:
+    """Validate an uploaded voice note in fixed-size chunks without loading it in memory.
+
+    Starlette already spools multipart uploads to a SpooledTemporaryFile, so the
+    handle is hashed and checked in place and handed over as-is to transcription.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while chunk := await upload.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > AUDIO_MAX_BYTES:
+            raise AudioRejected(f"Audio trop volumineux (max {AUDIO_MAX_BYTES // (1024 * 1024)} Mo)")
+        digest.update(chunk)
+
+    duration = ogg_duration_seconds(upload.file)
+    if duration is not None and duration > AUDIO_MAX_DURATION_SECONDS:
+        raise AudioRejected(f"Audio trop long (max {AUDIO_MAX_DURATION_SECONDS} s)")
+    await upload.seek(0)
+
+    # Estimate: the largest block read here (a chunk, or the Ogg tail); Starlette's spool
+    # itself keeps up to 1 MB in memory before rolling over to disk
+    peak_buffer_bytes = min(size, max(CHUNK_SIZE, OGG_TAIL_BYTES))
+    metrics.AUDIO_PAYLOAD_BYTES.observe(size)
+    if duration is not None:
+        metrics.AUDIO_DURATION_SECONDS.observe(duration)
+    logger.info(
+        f"Audio ingested: {size} bytes, duration {duration if duration is not None else '?'} s, "
+        f"read buffer ~{peak_buffer_bytes} bytes (estimate), process max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss} KB"
+    )
+    return IngestedAudio(
+        file=upload.file,
+        filename=upload.filename or "audio.ogg",
+        size=size,
+        digest=digest.hexdigest(),
+        duration=duration,
+        peak_buffer_bytes=peak_buffer_bytes,
+    )
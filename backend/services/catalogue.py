@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import schemas
+from config import CATALOGUE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogueSnapshot:
+    """Immutable view of the hairstyle catalogue, pre-serialized for HTTP."""
+
+    def __init__(self, styles: List[Dict[str, Any]], loaded_at: datetime):
+        self.styles = styles
+        self.names = [style["name"] for style in styles]
+        self.body = json.dumps(styles, ensure_ascii=False, separators=(",", ":")).encode()
+        # Strong validator: derived from the exact bytes served
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.last_modified = loaded_at.replace(microsecond=0)
+        self.last_modified_http = format_datetime(self.last_modified, usegmt=True)
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Evaluate conditional request headers (If-None-Match takes precedence, RFC 9110)."""
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+        if if_modified_since:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class HairstyleCatalogue:
+    """In-process cache of the hairstyle catalogue, shared by GET /hairstyles and the LLM prompt.
+
+    Writes to the hairstyles table must call invalidate(); the TTL is only a safety
+    net for changes made outside this process.
+    """
+
+    def __init__(self, ttl_seconds: float = CATALOGUE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._valid = False
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def _fresh(self) -> bool:
+        if self._snapshot is None or not self._valid:
+            return False
+        return self.ttl_seconds <= 0 or time.monotonic() < self._expires_at
+
+    async def get(self, db: AsyncSession) -> CatalogueSnapshot:
+        if self._fresh():
+            self.hits += 1
+            return self._snapshot
+        # A single load when many requests miss at once
+        async with self._lock:
+            if self._fresh():
+                self.hits += 1
+                return self._snapshot
+            result = await db.execute(select(models.Hairstyle).order_by(models.Hairstyle.id))
+            styles = [schemas.Hairstyle.model_validate(s).model_dump(mode="json") for s in result.scalars().all()]
+            snapshot = CatalogueSnapshot(styles, datetime.now(timezone.utc))
+            if self._snapshot is not None and self._snapshot.etag == snapshot.etag:
+                # Unchanged content keeps its validators, so clients keep getting 304
+                snapshot = self._snapshot
+            self._snapshot = snapshot
+            self._valid = True
+            self._expires_at = time.monotonic() + self.ttl_seconds
+            self.loads += 1
+            logger.info(f"Loaded hairstyle catalogue ({len(styles)} styles, ETag {snapshot.etag})")
+            return snapshot
+
+    def invalidate(self):
+        """Force a reload on next access; call after any write to the hairstyles table."""
+        self._valid = False
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "styles": len(self._snapshot.styles) if self._snapshot else 0,
+            "etag": self._snapshot.etag if self._snapshot else None,
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+catalogue = HairstyleCatalogue()
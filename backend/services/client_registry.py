@@ -0,0 +1,90 @@
+import logging
+from typing import Any, Dict
+
+import httpx
+from fastapi import Request
+from groq import AsyncGroq
+
+from services.transcription_backends import create_transcription_backend
+
+from config import (
+    GROQ_API_KEY,
+    HTTP2_ENABLED,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """Application-scoped outbound clients sharing one pooled HTTP connection pool, plus the transcription backend."""
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.requests_total = 0
+        self.responses_total = 0
+        # Responses per negotiated protocol ("HTTP/1.1", "HTTP/2"), to confirm HTTP/2 is in use
+        self.responses_by_http_version: Dict[str, int] = {}
+        self.http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=self.limits,
+            timeout=LLM_TIMEOUT_SECONDS,
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+        self.groq = None
+        if GROQ_API_KEY:
+            self.groq = AsyncGroq(
+                api_key=GROQ_API_KEY,
+                http_client=self.http_client,
+                timeout=LLM_TIMEOUT_SECONDS,
+                max_retries=LLM_MAX_RETRIES,
+            )
+        else:
+            logger.warning("GROQ_API_KEY is not set, LLM features are disabled")
+        self.transcription = create_transcription_backend(self.groq)
+
+    async def _on_request(self, request: httpx.Request):
+        self.requests_total += 1
+
+    async def _on_response(self, response: httpx.Response):
+        self.responses_total += 1
+        version = response.http_version
+        self.responses_by_http_version[version] = self.responses_by_http_version.get(version, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool settings and traffic counted through httpx's public event hooks."""
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "requests_total": self.requests_total,
+            # Requests without a response failed before one arrived (timeouts, connection errors)
+            "responses_total": self.responses_total,
+            "responses_by_http_version": dict(self.responses_by_http_version),
+        }
+
+    async def aclose(self):
+        logger.info(f"Closing HTTP client pool ({self.requests_total} requests served)")
+        if self.transcription:
+            await self.transcription.aclose()
+        await self.http_client.aclose()
+
+
+# Dependency
+def get_clients(request: Request) -> ClientRegistry:
+    return request.app.state.clients
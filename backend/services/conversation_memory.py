@@ -0,0 +1,173 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+
+import models
+from config import CONVERSATION_MAX_ENTRIES, CONVERSATION_TOKEN_BUDGET, CONVERSATION_TTL_SECONDS
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Per-message overhead of the chat format (role, separators)
+_MESSAGE_OVERHEAD_TOKENS = 4
+_CLIPPED = " […]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), enough to enforce a budget without a tokenizer."""
+    return len(text) // 4 + _MESSAGE_OVERHEAD_TOKENS
+
+
+def _turn(user: str, assistant: str) -> Dict[str, Any]:
+    return {"user": user, "assistant": assistant, "tokens": estimate_tokens(user) + estimate_tokens(assistant)}
+
+
+class ConversationMemory:
+    """Recent exchanges per sender, so follow-ups ("et à 15h plutôt ?") reach the LLM with their context.
+
+    Conversations live in an LRU in memory and are written through to SQLite, so
+    they survive restarts and evictions. History is trimmed from the oldest turn
+    to fit the token budget and forgotten after TTL seconds of inactivity.
+    """
+
+    def __init__(self, max_entries: int = CONVERSATION_MAX_ENTRIES, ttl_seconds: float = CONVERSATION_TTL_SECONDS,
+                 token_budget: int = CONVERSATION_TOKEN_BUDGET, session_factory=AsyncSessionLocal):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self._session_factory = session_factory
+        # sender_id -> (last activity on the monotonic clock, turns)
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.hits = 0
+        self.loads = 0
+        self.expired = 0
+        self.truncated_turns = 0
+        self.history_requests = 0
+        self.history_tokens = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.token_budget > 0
+
+    async def history(self, sender_id: str) -> List[Dict[str, str]]:
+        """Chat messages of the previous turns, oldest first; empty when expired or disabled."""
+        if not self.enabled:
+            return []
+        turns = await self._turns(sender_id)
+        if turns:
+            self.history_requests += 1
+            self.history_tokens += sum(t["tokens"] for t in turns)
+        messages = []
+        for t in turns:
+            messages.append({"role": "user", "content": t["user"]})
+            messages.append({"role": "assistant", "content": t["assistant"]})
+        return messages
+
+    async def append(self, sender_id: str, user: str, assistant: Optional[str]):
+        """Record an exchange and persist the trimmed conversation.
+
+        A storage error is logged, not raised: the reply is final by then, and
+        failing the message would make a job replay bookings it already made.
+        """
+        if not self.enabled or not assistant:
+            return
+        try:
+            turns = self._fit(await self._turns(sender_id) + [_turn(user, assistant)])
+            self._remember(sender_id, turns)
+            await self._store(sender_id, turns)
+        except Exception as e:
+            logger.error(f"Could not record the conversation of {sender_id}: {e}")
+
+    async def forget(self, sender_id: str):
+        self._entries.pop(sender_id, None)
+        async with self._session_factory() as db:
+            await db.execute(delete(models.Conversation).where(models.Conversation.sender_id == sender_id))
+            await db.commit()
+
+    def _fit(self, turns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop the oldest turns until the history fits the budget; clip a single oversized turn."""
+        dropped = 0
+        while len(turns) > 1 and sum(t["tokens"] for t in turns) > self.token_budget:
+            turns = turns[1:]
+            dropped += 1
+        if dropped:
+            self.truncated_turns += dropped
+        last = turns[-1]
+        if last["tokens"] > self.token_budget:
+            # Long listings mostly matter by their beginning
+            room = max(0, (self.token_budget - estimate_tokens(last["user"]) - _MESSAGE_OVERHEAD_TOKENS) * 4 - len(_CLIPPED))
+            turns[-1] = _turn(last["user"], last["assistant"][:room] + _CLIPPED)
+        return turns
+
+    async def _turns(self, sender_id: str) -> List[Dict[str, Any]]:
+        entry = self._entries.get(sender_id)
+        if entry is not None:
+            if time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(sender_id)
+                self.hits += 1
+                return list(entry[1])
+            del self._entries[sender_id]
+            self.expired += 1
+            return []
+
+        async with self._session_factory() as db:
+            row = await db.get(models.Conversation, sender_id)
+        if row is None:
+            return []
+        age = (datetime.now() - row.updated_at).total_seconds()
+        if age > self.ttl_seconds:
+            self.expired += 1
+            return []
+        self.loads += 1
+        turns = json.loads(row.turns or "[]")
+        self._remember(sender_id, turns, last_activity=time.monotonic() - age)
+        return list(turns)
+
+    def _remember(self, sender_id: str, turns: List[Dict[str, Any]], last_activity: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        self._entries[sender_id] = (last_activity if last_activity is not None else time.monotonic(), turns)
+        self._entries.move_to_end(sender_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _store(self, sender_id: str, turns: List[Dict[str, Any]]):
+        now = datetime.now()
+        async with self._session_factory() as db:
+            await db.merge(models.Conversation(
+                sender_id=sender_id,
+                turns=json.dumps(turns, ensure_ascii=False),
+                tokens=sum(t["tokens"] for t in turns),
+                updated_at=now,
+            ))
+            # Expired conversations are dropped lazily, on the next write
+            await db.execute(
+                delete(models.Conversation)
+                .where(models.Conversation.updated_at < now - timedelta(seconds=self.ttl_seconds))
+            )
+            await db.commit()
+
+    async def stats(self) -> Dict[str, Any]:
+        async with self._session_factory() as db:
+            stored, stored_tokens = (await db.execute(
+                select(func.count(), func.coalesce(func.sum(models.Conversation.tokens), 0))
+            )).one()
+        return {
+            "in_memory": len(self._entries),
+            "stored": stored,
+            "stored_tokens": stored_tokens,
+            "token_budget": self.token_budget,
+            "hits": self.hits,
+            "loads": self.loads,
+            "expired": self.expired,
+            "truncated_turns": self.truncated_turns,
+            "avg_history_tokens": round(self.history_tokens / self.history_requests, 1) if self.history_requests else 0.0,
+        }
+
+
+conversation_memory = ConversationMemory()
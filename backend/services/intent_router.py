@@ -0,0 +1,148 @@
+import re
+import logging
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.catalogue import catalogue
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+MONTHS = [
+    "janvier", "fevrier", "mars", "avril", "mai", "juin",
+    "juillet", "aout", "septembre", "octobre", "novembre", "decembre",
+]
+
+FREE_SLOTS_RE = re.compile(r"\b(creneaux?|heures?|places?)\s+(libres?|creuses?|dispo\w*)\b|\bdisponibilites?\b|\bdispos?\b")
+APPOINTMENTS_RE = re.compile(r"\b(rdv|rendez[ -]vous|planning|agenda)\b")
+CANCEL_RE = re.compile(r"\bannul\w*\b")
+BLOCK_RE = re.compile(r"\b(bloqu|reserv|ajout|cale)\w*\b")
+# Verbs that make a request more than a plain listing; those go to the LLM
+OTHER_ACTION_RE = re.compile(r"\b(annul|bloqu|reserv|ajout|cale|deplac|modifi|change|confirm)\w*\b")
+# Short codes shown in listings (8 characters, always with a digit: see models.new_short_code);
+# requiring a digit keeps plain words out
+ID_PREFIX_RE = re.compile(r"\b(?=[0-9a-z]*\d)[0-9a-z]{8}\b")
+TIME_RE = re.compile(r"\b([01]?\d|2[0-3])\s*(?:h|:)\s*([0-5]\d)?\b")
+NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+TEXT_DATE_RE = re.compile(r"\b(\d{1,2})(?:er)?\s+(" + "|".join(MONTHS) + r")(?:\s+(\d{4}))?\b")
+CUSTOMER_RE = re.compile(r"\bpour\s+([A-ZÀ-Ý][\w'-]+)")
+
+# Process-wide hit/miss counters, reported on /stats
+_stats: Dict[str, Any] = {"hits": 0, "misses": 0, "by_intent": {}}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation so French phrasings compare equal."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("’", "'")
+    text = re.sub(r"[?!.,;]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def parse_date(text: str, today: date) -> Optional[date]:
+    """Resolve a relative or explicit French date in normalized text."""
+    if re.search(r"\bapres[ -]demain\b", text):
+        return today + timedelta(days=2)
+    if re.search(r"\bdemain\b", text):
+        return today + timedelta(days=1)
+    if re.search(r"\b(aujourd'?hui|ce jour)\b", text):
+        return today
+
+    for index, name in enumerate(WEEKDAYS):
+        match = re.search(rf"\b{name}( prochain)?\b", text)
+        if match:
+            delta = (index - today.weekday()) % 7
+            if delta == 0 and match.group(1):
+                delta = 7
+            return today + timedelta(days=delta)
+
+    match = NUMERIC_DATE_RE.search(text) or TEXT_DATE_RE.search(text)
+    if match:
+        day_str, month_str, year_str = match.groups()
+        month = int(month_str) if month_str.isdigit() else MONTHS.index(month_str) + 1
+        year = int(year_str) if year_str else today.year
+        if year < 100:
+            year += 2000
+        try:
+            parsed = date(year, month, int(day_str))
+        except ValueError:
+            return None
+        if not year_str and parsed < today:
+            parsed = parsed.replace(year=year + 1)
+        return parsed
+
+    return None
+
+
+def parse_time(text: str) -> Optional[str]:
+    match = TIME_RE.search(text)
+    if not match:
+        return None
+    return f"{int(match.group(1)):02d}:{match.group(2) or '00'}"
+
+
+def parse_intent(text: str, style_names: List[str], today: date) -> Optional[Tuple[str, Dict[str, str]]]:
+    """Map a message to (tool name, tool arguments) when it is unambiguous, else None."""
+    normalized = normalize(text)
+    day = parse_date(normalized, today)
+
+    if CANCEL_RE.search(normalized):
+        ids = ID_PREFIX_RE.findall(normalized)
+        if len(ids) == 1:
+            return "cancel_appointment", {"appointment_id": ids[0]}
+        return None
+
+    if BLOCK_RE.search(normalized):
+        styles = [name for name in style_names if normalize(name) in normalized]
+        time_str = parse_time(normalized)
+        style_words = {word for name in styles for word in name.split()}
+        customers = [c for c in CUSTOMER_RE.findall(text) if c not in style_words]
+        if len(styles) == 1 and day and time_str and customers:
+            return "block_time_slot", {
+                "customer_name": customers[0],
+                "style_name": styles[0],
+                "date_time": f"{day.isoformat()} {time_str}",
+            }
+        return None
+
+    if OTHER_ACTION_RE.search(normalized):
+        return None
+
+    if FREE_SLOTS_RE.search(normalized):
+        return "list_free_slots", {"date": (day or today).isoformat()}
+
+    if APPOINTMENTS_RE.search(normalized) and day:
+        return "list_appointments", {"date": day.isoformat()}
+
+    return None
+
+
+def stats() -> Dict[str, Any]:
+    total = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": round(_stats["hits"] / total, 3) if total else 0.0}
+
+
+class IntentRouter:
+    """Answers unambiguous requests by calling LLMService tools directly, skipping Groq."""
+
+    def __init__(self, llm_service):
+        self.llm_service = llm_service
+        self.db = llm_service.db
+        self.tools = llm_service.tools
+
+    async def route(self, text: str) -> Optional[str]:
+        """Return the tool answer for a confident match, or None to fall back to the LLM."""
+        style_names = (await catalogue.get(self.db)).names
+        intent = parse_intent(text, style_names, datetime.now().date())
+
+        if intent is None:
+            _stats["misses"] += 1
+            return None
+
+        tool_name, tool_args = intent
+        _stats["hits"] += 1
+        _stats["by_intent"][tool_name] = _stats["by_intent"].get(tool_name, 0) + 1
+        logger.info(f"Fast path matched {tool_name} with args: {tool_args}")
+        return await self.tools[tool_name](**tool_args)
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import Request
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+import models
+from config import (
+    AUDIO_STORAGE_DIR,
+    JOB_CALLBACK_ALLOWED_URLS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_INTERVAL_SECONDS,
+    JOB_RETRY_BASE_SECONDS,
+    JOB_WORKERS,
+)
+from database import AsyncSessionLocal
+from services.audio_ingest import IngestedAudio
+from services.client_registry import ClientRegistry
+from services.messages_service import MessagesService
+from services.tracing import SPAN_KIND_INTERNAL, tracer
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED = ("queued", "running")
+
+
+def callback_allowed(url: str, allowed: Sequence[str] = JOB_CALLBACK_ALLOWED_URLS) -> bool:
+    """Whether `url` lies under one of the configured callback base URLs.
+
+    Scheme and host:port must match exactly and the path must extend the base path,
+    so a caller cannot make the server POST to internal addresses.
+    """
+    try:
+        target = urlsplit(url)
+        target_port = target.port
+    except ValueError:
+        return False
+    if target.scheme not in ("http", "https") or not target.hostname or target.username or target.password:
+        return False
+    for base in allowed:
+        prefix = urlsplit(base)
+        if (target.scheme, target.hostname, target_port) != (prefix.scheme, prefix.hostname, prefix.port):
+            continue
+        base_path = prefix.path if prefix.path.endswith("/") else prefix.path + "/"
+        if target.path == prefix.path or target.path.startswith(base_path):
+            return True
+    return False
+
+
+class JobQueue:
+    """Persistent queue of incoming messages processed by a pool of asyncio workers.
+
+    Jobs of the same sender run strictly in arrival order; failures are retried
+    with exponential backoff and replies are kept for polling or pushed to a callback.
+    """
+
+    def __init__(self, clients: ClientRegistry, workers: int = JOB_WORKERS):
+        self.clients = clients
+        self.workers = workers
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    # Enqueue -----------------------------------------------------------------
+
+    async def _existing(self, db: AsyncSession, idempotency_key: Optional[str]) -> Optional[models.MessageJob]:
+        if not idempotency_key:
+            return None
+        result = await db.execute(select(models.MessageJob).where(models.MessageJob.idempotency_key == idempotency_key))
+        return result.scalars().first()
+
+    async def _add(self, db: AsyncSession, job: models.MessageJob) -> Tuple[models.MessageJob, bool]:
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request with the same idempotency key won the insert
+            await db.rollback()
+            if not job.idempotency_key:
+                raise
+            self._discard_audio(job)
+            existing = await self._existing(db, job.idempotency_key)
+            if existing is None:
+                raise
+            return existing, False
+        self._wakeup.set()
+        logger.info(f"Queued job {job.id} ({job.type}) for {job.sender_id}")
+        return job, True
+
+    async def enqueue_text(self, db: AsyncSession, sender_id: str, message: str,
+                     idempotency_key: Optional[str] = None, callback_url: Optional[str] = None) -> Tuple[models.MessageJob, bool]:
+        """Queue a text message. Returns (job, created); a known idempotency key returns the original job."""
+        existing = await self._existing(db, idempotency_key)
+        if existing:
+            return existing, False
+        return await self._add(db, models.MessageJob(
+            idempotency_key=idempotency_key,
+            sender_id=sender_id,
+            type="text",
+            message=message,
+            callback_url=callback_url,
+        ))
+
+    async def enqueue_audio(self, db: AsyncSession, sender_id: str, audio: IngestedAudio,
+                      idempotency_key: Optional[str] = None, callback_url: Optional[str] = None) -> Tuple[models.MessageJob, bool]:
+        """Queue a voice note, copying the spooled upload to AUDIO_STORAGE_DIR."""
+        existing = await self._existing(db, idempotency_key)
+        if existing:
+            return existing, False
+
+        suffix = os.path.splitext(audio.filename)[1] or ".ogg"
+        path = os.path.join(AUDIO_STORAGE_DIR, f"{uuid.uuid4()}{suffix}")
+        await asyncio.to_thread(self._store_audio, audio, path)
+
+        return await self._add(db, models.MessageJob(
+            idempotency_key=idempotency_key,
+            sender_id=sender_id,
+            type="audio",
+            audio_path=path,
+            audio_filename=audio.filename,
+            audio_digest=audio.digest,
+            callback_url=callback_url,
+        ))
+
+    @staticmethod
+    def _store_audio(audio: IngestedAudio, path: str):
+        os.makedirs(AUDIO_STORAGE_DIR, exist_ok=True)
+        audio.file.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(audio.file, out)
+
+    # Workers -----------------------------------------------------------------
+
+    async def start(self):
+        async with AsyncSessionLocal() as db:
+            # Jobs interrupted by a restart are picked up again
+            result = await db.execute(
+                update(models.MessageJob)
+                .where(models.MessageJob.status == "running")
+                .values(status="queued")
+            )
+            await db.commit()
+        recovered = result.rowcount
+        if recovered:
+            logger.info(f"Re-queued {recovered} interrupted jobs")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self, db: AsyncSession) -> Optional[models.MessageJob]:
+        """Atomically take the oldest runnable job whose sender has no earlier unfinished job."""
+        earlier = aliased(models.MessageJob)
+        candidates = await db.execute(
+            select(models.MessageJob.id)
+            .where(models.MessageJob.status == "queued")
+            .where(models.MessageJob.next_run_at <= datetime.now())
+            .where(~exists().where(
+                earlier.sender_id == models.MessageJob.sender_id,
+                earlier.status.in_(UNFINISHED),
+                earlier.id < models.MessageJob.id,
+            ))
+            .order_by(models.MessageJob.id)
+            .limit(self.workers)
+        )
+        for job_id in candidates.scalars().all():
+            claimed = await db.execute(
+                update(models.MessageJob)
+                .where(models.MessageJob.id == job_id, models.MessageJob.status == "queued")
+                .values(status="running", attempts=models.MessageJob.attempts + 1)
+            )
+            await db.commit()
+            if claimed.rowcount:
+                return await db.get(models.MessageJob, job_id)
+        return None
+
+    async def _worker(self, index: int):
+        while not self._stopping:
+            async with AsyncSessionLocal() as db:
+                job = await self._claim(db)
+                if job is not None:
+                    await self._run(db, job)
+                    continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, db: AsyncSession, job: models.MessageJob):
+        try:
+            if job.reply is None:
+                job.reply = await self._process(db, job)
+                await db.commit()
+            if job.callback_url and not job.delivered:
+                if callback_allowed(job.callback_url):
+                    await self._deliver(job)
+                    job.delivered = True
+                else:
+                    # The allowlist changed since the job was queued; the reply stays available for polling
+                    logger.warning(f"Job {job.id}: callback URL no longer allowed, not delivered")
+            job.status = "done"
+            job.error = None
+            await db.commit()
+            self._discard_audio(job)
+            logger.info(f"Job {job.id} done after {job.attempts} attempt(s)")
+        except Exception as e:
+            await db.rollback()
+            # The rollback expired the job; reload it before recording the failure
+            await db.refresh(job)
+            job.error = str(e)
+            if job.attempts >= JOB_MAX_ATTEMPTS:
+                job.status = "failed"
+                self._discard_audio(job)
+                logger.error(f"Job {job.id} failed after {job.attempts} attempts: {e}")
+            else:
+                delay = JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+                job.status = "queued"
+                job.next_run_at = datetime.now() + timedelta(seconds=delay)
+                logger.warning(f"Job {job.id} attempt {job.attempts} failed ({e}), retrying in {delay:.1f}s")
+            await db.commit()
+
+    async def _process(self, db: AsyncSession, job: models.MessageJob) -> str:
+        service = MessagesService(db, llm_client=self.clients.groq, transcriber=self.clients.transcription)
+        with tracer.start_trace("messages.job", kind=SPAN_KIND_INTERNAL,
+                                **{"job.id": job.id, "job.type": job.type, "job.attempt": job.attempts}):
+            if job.type == "audio":
+                with open(job.audio_path, "rb") as audio_file:
+                    return await service.process_audio_message(audio_file, job.audio_filename, job.sender_id,
+                                                               digest=job.audio_digest, raise_errors=True)
+            # Failures raise so that the job is retried instead of storing an apology as the reply
+            return await service.process_message(job.message, job.sender_id, raise_errors=True)
+
+    async def _deliver(self, job: models.MessageJob):
+        response = await self.clients.http_client.post(job.callback_url, json={
+            "job_id": job.id,
+            "sender_id": job.sender_id,
+            "status": "done",
+            "reply": job.reply,
+        })
+        response.raise_for_status()
+
+    def _discard_audio(self, job: models.MessageJob):
+        if job.audio_path and os.path.exists(job.audio_path):
+            os.remove(job.audio_path)
+
+    async def stats(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.MessageJob.status, func.count())
+                .group_by(models.MessageJob.status)
+            )
+            counts = dict(result.all())
+        return {"workers": len(self._tasks), **counts}
+
+
+# Dependency
+def get_job_queue(request: Request) -> JobQueue:
+    return request.app.state.job_queue
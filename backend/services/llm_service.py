@@ -1,188 +1,337 @@
 import io
-import os
 import json
+import time
+import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from groq import Groq
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from groq import AsyncGroq
 
 import models
 import schemas
-from database import SessionLocal
+from database import AsyncSessionLocal
+from services.appointment_service import AppointmentService, compute_end_at, style_duration
+from services.catalogue import catalogue
+from services.conversation_memory import conversation_memory
+from services import metrics, prompt_builder
+from services.response_cache import READ_ONLY_TOOLS, response_cache
+from services.slot_engine import WEEKDAY_NAMES_FR, slot_engine
+from services.transcription_cache import audio_digest, transcription_cache
+from services.transcription_backends import GroqWhisperBackend, TranscriptionBackend
+from services.tracing import MAX_ATTRIBUTE_LENGTH, SPAN_KIND_CLIENT, tracer
+from config import (
+    GROQ_API_KEY,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_TOOL_ROUNDS,
+    LLM_MAX_RETRIES,
+    LLM_TIMEOUT_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
-class LLMService:
-    def __init__(self, db: Session):
-        self.db = db
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.model = "llama-3.3-70b-versatile"
-        self.whisper_model = "whisper-large-v3-turbo"
+# Process-wide cap on in-flight chat completions, shared by every LLMService instance
+_chat_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
-    async def transcribe_audio(self, audio_content: bytes, filename: str) -> str:
-        """Transcribe audio content (bytes) using Groq Whisper."""
-        try:
-            logger.info(f"Transcribing audio: {filename} ({len(audio_content)} bytes)")
-            
-            # Wrap bytes in a file-like object for Groq
-            audio_file = io.BytesIO(audio_content)
-            audio_file.name = filename
-            
-            transcription = self.client.audio.transcriptions.create(
-                file=audio_file,
-                model=self.whisper_model,
-                response_format="text",
-                language="fr"  # Assuming predominantly French
-            )
-            
-            logger.info(f"Transcription result: {transcription}")
-            return str(transcription).strip()
+# Tools whose result is already a complete French answer for the admin. When the
+# model calls exactly one of them, the result is returned as-is without a second
+# completion to rephrase it.
+DIRECT_ANSWER_TOOLS = {
+    "list_appointments",
+    "list_free_slots",
+    "find_slots_for_style",
+    "block_time_slot",
+    "cancel_appointment",
+}
 
-        except Exception as e:
-            logger.error(f"Error in LLM transcribe_audio: {e}")
-            raise e
+# Tools whose answer for today changes as time passes (slots that have started drop out)
+CLOCK_DEPENDENT_TOOLS = {"list_free_slots", "find_slots_for_style"}
 
-    async def process_message(self, text: str, sender_id: str) -> str:
-        """Process a message using GROQ LLM and function calling."""
-        
-        # Fetch hairstyles for context
-        styles = self.db.query(models.Hairstyle).all()
-        style_names = ", ".join([s.name for s in styles])
-
-        system_prompt = (
-            "Tu es l'assistant de gestion d'Anip Hair. "
-            f"Date du jour : {datetime.now().strftime('%Y-%m-%d')}. "
-            "Catalogue : " + style_names + ". "
-            "Utilise les outils pour répondre aux demandes."
-        )
+# Longest range find_slots_for_style will scan
+MAX_SLOT_SEARCH_DAYS = 31
+DEFAULT_SLOT_SEARCH_DAYS = 7
+
+
+def _search_days(value: Any) -> int:
+    """`days` argument of find_slots_for_style, clamped; anything unparseable means a week."""
+    try:
+        days = int(value or DEFAULT_SLOT_SEARCH_DAYS)
+    except (TypeError, ValueError, OverflowError):
+        days = DEFAULT_SLOT_SEARCH_DAYS
+    return max(1, min(days, MAX_SLOT_SEARCH_DAYS))
 
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_appointments",
-                    "description": "Liste les rendez-vous d'une journée.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "date": {
-                                "type": "string",
-                                "description": "Date au format YYYY-MM-DD"
-                            }
-                        },
-                        "required": ["date"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_free_slots",
-                    "description": "Trouve les créneaux libres d'une journée.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "date": {
-                                "type": "string",
-                                "description": "Date au format YYYY-MM-DD"
-                            }
-                        },
-                        "required": ["date"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "block_time_slot",
-                    "description": "Bloque un créneau horaire.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "customer_name": {"type": "string"},
-                            "style_name": {"type": "string"},
-                            "date_time": {"type": "string", "description": "YYYY-MM-DD HH:MM"}
-                        },
-                        "required": ["customer_name", "style_name", "date_time"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "cancel_appointment",
-                    "description": "Annule un rendez-vous.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "appointment_id": {"type": "string", "description": "ID ou partie de l'ID"},
-                            "customer_name": {"type": "string"}
-                        },
-                        "required": []
-                    }
-                }
-            }
-        ]
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": text}
-        ]
-
-        functions_map = {
+# Moving average of the synthesis completion latency, used to estimate the time
+# saved by direct answers
+_synthesis_latency_ms: Optional[float] = None
+
+class LLMService:
+    def __init__(self, db: AsyncSession, client: Optional[AsyncGroq] = None, transcriber: Optional[TranscriptionBackend] = None):
+        self.db = db
+        # The app injects the pooled client from ClientRegistry; standalone scripts get their own
+        self.client = client or AsyncGroq(
+            api_key=GROQ_API_KEY,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=LLM_MAX_RETRIES,
+        )
+        self.transcriber = transcriber or GroqWhisperBackend(self.client)
+        self.model = "llama-3.3-70b-versatile"
+        # Outputs of the mutating tools run for the current message (each commits its own write)
+        self.writes: List[str] = []
+        # Tool name -> coroutine, shared with the intent router
+        self.tools = {
             "list_appointments": self._tool_list_appointments,
             "list_free_slots": self._tool_list_free_slots,
+            "find_slots_for_style": self._tool_find_slots_for_style,
             "block_time_slot": self._tool_block_time_slot,
             "cancel_appointment": self._tool_cancel_appointment,
         }
 
+    async def transcribe_audio(self, audio: Union[bytes, BinaryIO], filename: str, digest: Optional[str] = None) -> str:
+        """Transcribe audio (bytes or a file handle) with the configured backend, reusing cached results."""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto"
-            )
-
-            response_message = response.choices[0].message
-            tool_calls = response_message.tool_calls
-
-            if tool_calls:
-                # Add the assistant's message with tool calls to history
-                messages.append(response_message)
-                
-                for tool_call in tool_calls:
-                    tool_name = tool_call.function.name
-                    tool_args = json.loads(tool_call.function.arguments)
-                    
-                    logger.info(f"LLM calling function: {tool_name} with args: {tool_args}")
-                    
-                    # Execute the tool
-                    if tool_name in functions_map:
-                        result = await functions_map[tool_name](**tool_args)
-                        
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "name": tool_name,
-                            "content": json.dumps(result) if not isinstance(result, str) else result
-                        })
-                
-                # Get the final response from the model
-                second_response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
+            if isinstance(audio, bytes):
+                # Wrap bytes in a file-like object for the backend
+                audio = io.BytesIO(audio)
+            audio.seek(0, 2)
+            size = audio.tell()
+            audio.seek(0)
+            logger.info(f"Transcribing audio: {filename} ({size} bytes)")
+
+            # A cache miss shows as a nested transcription span
+            with tracer.span("transcribe_audio", **{"audio.size_bytes": size}):
+                if digest is None:
+                    digest = audio_digest(audio)
+                return await transcription_cache.get_or_transcribe(
+                    digest,
+                    size,
+                    lambda: self._transcribe_with_backend(audio, filename),
                 )
-                return second_response.choices[0].message.content
-            
-            return response_message.content
 
         except Exception as e:
-            logger.error(f"Error in LLM process_message: {e}")
-            return f"Désolé, j'ai rencontré une erreur technique : {str(e)}"
+            logger.error(f"Error in LLM transcribe_audio: {e}")
+            raise e
+
+    async def _transcribe_with_backend(self, audio_file: BinaryIO, filename: str) -> str:
+        started = time.perf_counter()
+        with tracer.span(f"transcription.{self.transcriber.name}", kind=SPAN_KIND_CLIENT):
+            transcription = await self.transcriber.transcribe(audio_file, filename)
+        metrics.TRANSCRIPTION_SECONDS.observe(time.perf_counter() - started, backend=self.transcriber.name)
+        logger.info(f"Transcription result ({self.transcriber.name}): {transcription}")
+        return transcription
+
+    async def process_message(self, text: str, sender_id: str, raise_errors: bool = False) -> str:
+        """Process a message using GROQ LLM and function calling.
+
+        Errors become an apology for the sender, unless `raise_errors` is set
+        (background jobs, which retry). An error after a booking or cancellation
+        has committed does neither: replaying the turn would repeat the write, so
+        the outputs of the mutating tools are the answer.
+        """
+        self.writes = []
+
+        # Follow-ups depend on the previous turns, so only standalone questions use the cache
+        history = await conversation_memory.history(sender_id)
+        answer = response_cache.get(text) if not history else None
+        if answer is not None:
+            logger.info("Answer served from the response cache")
+        else:
+            try:
+                answer = await self._answer(text, history)
+            except Exception as e:
+                logger.error(f"Error in LLM process_message: {e}")
+                if self.writes:
+                    logger.warning(f"Answering with the output of {len(self.writes)} committed tool call(s) instead")
+                    answer = "\n\n".join(self.writes)
+                elif raise_errors:
+                    raise
+                else:
+                    return f"Désolé, j'ai rencontré une erreur technique : {str(e)}"
+
+        # Cached answers are recorded too, so that a follow-up sees the exchange
+        await conversation_memory.append(sender_id, text, answer)
+        return answer
+
+    async def _answer(self, text: str, history: List[Dict[str, Any]]) -> Optional[str]:
+        # Prompt compiled once; only the catalogue and date tail vary between requests
+        snapshot = await catalogue.get(self.db)
+        messages = prompt_builder.build_messages(text, snapshot.names, datetime.now().date(), history)
+        cacheable = not history
+
+        called = []
+        for round_number in range(1, LLM_MAX_TOOL_ROUNDS + 2):
+            # Once the round cap is reached the model has to answer from the results it has
+            tools = prompt_builder.tools() if round_number <= LLM_MAX_TOOL_ROUNDS else None
+            stage = "tool selection" if round_number == 1 else "synthesis"
+            started = time.perf_counter()
+            if tools is None:
+                response = await self._chat_completion(messages=messages)
+            else:
+                response = await self._chat_completion(messages=messages, tools=tools, tool_choice="auto")
+            latency_ms = (time.perf_counter() - started) * 1000
+            prompt_builder.record_usage(response, latency_ms, stage)
+            if round_number > 1:
+                self._record_synthesis_latency(latency_ms)
 
-    # Suppression de la méthode _execute_tool devenue inutile car on utilise functions_map
+            response_message = response.choices[0].message
+            tool_calls = response_message.tool_calls
+            if not tool_calls:
+                if cacheable:
+                    self._cache_if_read_only(text, called, response_message.content)
+                return response_message.content
+
+            # Add the assistant's message with tool calls to history
+            messages.append(response_message)
+            results = await self._execute_tool_calls(tool_calls)
+            for tool_call, tool_name, tool_args, result in results:
+                called.append((tool_name, tool_args))
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "name": tool_name,
+                    "content": json.dumps(result) if not isinstance(result, str) else result
+                })
+
+            if round_number == 1:
+                direct_answer = self._direct_answer(tool_calls, [(name, result) for _, name, _, result in results])
+                if direct_answer is not None:
+                    saved_ms = _synthesis_latency_ms or latency_ms
+                    logger.info(f"Direct answer from {results[0][1]}, skipped synthesis (~{saved_ms:.0f} ms saved)")
+                    if cacheable:
+                        self._cache_if_read_only(text, called, direct_answer)
+                    return direct_answer
+
+    async def _execute_tool_calls(self, tool_calls) -> List[Tuple[Any, str, Dict[str, Any], Any]]:
+        """Run one round of tool calls, returning (tool_call, name, args, result) in call order.
+
+        Consecutive read-only calls run concurrently, each on its own session; a
+        mutating call waits for the calls before it and runs alone, so the model's
+        ordering is kept wherever a write is involved.
+        """
+        # (tool_call, name, args, error); every call gets an answer, even one that cannot run
+        calls = []
+        for tool_call in tool_calls:
+            tool_name = tool_call.function.name
+            tool_args, error = {}, None
+            if tool_name not in self.tools:
+                error = f"Outil inconnu : {tool_name}"
+            else:
+                try:
+                    tool_args = json.loads(tool_call.function.arguments or "{}")
+                    if not isinstance(tool_args, dict):
+                        raise ValueError("arguments are not a JSON object")
+                except (TypeError, ValueError) as e:
+                    tool_args, error = {}, f"Arguments invalides pour {tool_name} : {e}"
+            if error:
+                logger.warning(f"LLM tool call rejected: {error}")
+            calls.append((tool_call, tool_name, tool_args, error))
+
+        started = time.perf_counter()
+        results = []
+        batch = []
+        for call in calls + [None]:
+            if call is not None and call[3] is None and call[1] in READ_ONLY_TOOLS:
+                batch.append(call)
+                continue
+            if len(batch) == 1:
+                results.append(await self._run_tool(*batch[0][:3]))
+            elif batch:
+                results.extend(await asyncio.gather(*(self._run_tool(*c[:3], own_session=True) for c in batch)))
+            batch = []
+            if call is not None:
+                if call[3] is None:
+                    results.append(await self._run_tool(*call[:3]))
+                else:
+                    # Returned to the model as the tool output, so it can correct the call
+                    results.append((call[0], call[1], call[2], {"error": call[3]}))
+
+        if len(results) > 1:
+            logger.info(f"Ran {len(results)} tool calls in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return results
+
+    async def _run_tool(self, tool_call, tool_name: str, tool_args: Dict[str, Any], own_session: bool = False):
+        logger.info(f"LLM calling function: {tool_name} with args: {tool_args}")
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            arguments = json.dumps(tool_args, ensure_ascii=False)[:MAX_ATTRIBUTE_LENGTH]
+            with tracer.span(f"tool.{tool_name}", **{"tool.arguments": arguments}):
+                if own_session:
+                    # An AsyncSession cannot be shared by concurrent queries
+                    async with AsyncSessionLocal() as db:
+                        service = LLMService(db, client=self.client, transcriber=self.transcriber)
+                        result = await service.tools[tool_name](**tool_args)
+                else:
+                    result = await self.tools[tool_name](**tool_args)
+            outcome = "ok"
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.LLM_TOOL_SECONDS.observe(elapsed, tool=tool_name, outcome=outcome)
+        if tool_name not in READ_ONLY_TOOLS:
+            self.writes.append(result)
+        logger.info(f"Tool {tool_name} took {elapsed * 1000:.0f} ms")
+        return tool_call, tool_name, tool_args, result
+
+    def _direct_answer(self, tool_calls, results) -> Optional[str]:
+        """Return the tool output itself when a single deterministic tool answered the request."""
+        if len(tool_calls) != 1 or len(results) != 1:
+            return None
+        tool_name, result = results[0]
+        if tool_name not in DIRECT_ANSWER_TOOLS or not isinstance(result, str):
+            return None
+        return result
+
+    def _cache_if_read_only(self, text: str, called, answer: Optional[str]):
+        """Cache answers built only from read-only tools, keyed to the days they read."""
+        if not called or not answer or any(name not in READ_ONLY_TOOLS for name, _ in called):
+            return
+        now = datetime.now()
+        today = now.date().isoformat()
+        days, ttl_seconds = [], None
+        for name, args in called:
+            read = self._days_read(name, args)
+            days += read
+            if name in CLOCK_DEPENDENT_TOOLS and any(str(day)[:10] == today for day in read):
+                # Today's slots are only valid until the next step of the grid
+                ttl_seconds = (slot_engine.next_step(now) - now).total_seconds()
+        response_cache.set(text, answer, days, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def _days_read(tool_name: str, args: Dict[str, Any]) -> List[Any]:
+        """Appointment days a read-only tool call depended on, for cache invalidation."""
+        if tool_name == "find_slots_for_style":
+            try:
+                first = datetime.strptime(args["start_date"], "%Y-%m-%d").date() if args.get("start_date") else datetime.now().date()
+            except ValueError:
+                return []
+            return [first + timedelta(days=offset) for offset in range(_search_days(args.get("days")))]
+        return [args.get("date") or datetime.now().date()]
+
+    def _record_synthesis_latency(self, latency_ms: float):
+        global _synthesis_latency_ms
+        if _synthesis_latency_ms is None:
+            _synthesis_latency_ms = latency_ms
+        else:
+            _synthesis_latency_ms = 0.8 * _synthesis_latency_ms + 0.2 * latency_ms
+
+    async def _chat_completion(self, **kwargs):
+        """Run a chat completion without blocking the event loop, within the concurrency cap."""
+        with tracer.span(f"chat {self.model}", kind=SPAN_KIND_CLIENT, **{
+            "gen_ai.system": "groq",
+            "gen_ai.request.model": self.model,
+            "gen_ai.request.tools": bool(kwargs.get("tools")),
+        }) as span:
+            waited = time.perf_counter()
+            async with _chat_semaphore:
+                span.set_attribute("concurrency.wait_ms", round((time.perf_counter() - waited) * 1000, 1))
+                response = await self.client.chat.completions.create(model=self.model, **kwargs)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                span.set_attribute("gen_ai.usage.input_tokens", getattr(usage, "prompt_tokens", None))
+                span.set_attribute("gen_ai.usage.output_tokens", getattr(usage, "completion_tokens", None))
+            return response
+
+    # Suppression de la méthode _execute_tool devenue inutile car on utilise self.tools
 
     async def _tool_list_appointments(self, date: Optional[str] = None) -> str:
         if not date:
@@ -196,14 +345,7 @@ class LLMService:
         start_of_day = date_dt.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = start_of_day + timedelta(days=1)
 
-        appts = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.date >= start_of_day)
-            .filter(models.Appointment.date < end_of_day)
-            .filter(models.Appointment.status != "canceled")
-            .order_by(models.Appointment.date)
-            .all()
-        )
+        appts = await AppointmentService(self.db).list_appointments(start_of_day, end_of_day)
 
         if not appts:
             return f"Aucun rendez-vous prévu pour le {date_dt.strftime('%d/%m/%Y')}."
@@ -211,7 +353,7 @@ class LLMService:
         msg = f"Rendez-vous pour le {date_dt.strftime('%d/%m/%Y')} :\n"
         for a in appts:
             time_str = a.date.strftime('%H:%M')
-            msg += f"- {time_str} : {a.customer_name} ({a.style.name if a.style else 'N/A'}) [ID: {a.id[:8]}]\n"
+            msg += f"- {time_str} : {a.customer_name} ({a.style.name if a.style else 'N/A'}) [ID: {a.short_code}]\n"
         
         return msg
 
@@ -224,52 +366,55 @@ class LLMService:
             except ValueError:
                 return "Format de date invalide. Utilisez YYYY-MM-DD."
 
-        # Heures d'ouverture: 09h00 - 18h00
-        opening_time = date_dt.replace(hour=9, minute=0, second=0, microsecond=0)
-        closing_time = date_dt.replace(hour=18, minute=0, second=0, microsecond=0)
-
-        # Chercher tous les appts du jour
         start_of_day = date_dt.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = start_of_day + timedelta(days=1)
-        
-        appts = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.date >= start_of_day)
-            .filter(models.Appointment.date < end_of_day)
-            .filter(models.Appointment.status != "canceled")
-            .all()
-        )
+        busy = await AppointmentService(self.db).busy_intervals(start_of_day, end_of_day)
+        windows = slot_engine.free_windows(busy, start_of_day.date())
 
-        # Liste des créneaux occupés
-        occupied_periods = []
-        for a in appts:
-            start = a.date
-            # Durée par défaut 2h si non précisé
-            duration_str = a.style.duration if a.style else "2h"
-            duration = self._parse_duration(duration_str)
-            end = start + duration
-            occupied_periods.append((start, end))
-
-        # Trouver les créneaux libres (simples créneaux de 1h pour simplifier la vue)
-        free_slots = []
-        current = opening_time
-        while current < closing_time:
-            next_hour = current + timedelta(hours=1)
-            is_occupied = False
-            for start, end in occupied_periods:
-                if (current < end) and (next_hour > start):
-                    is_occupied = True
-                    break
-            
-            if not is_occupied:
-                free_slots.append(current.strftime('%H:%M'))
-            
-            current = next_hour
-
-        if not free_slots:
+        if not windows:
             return f"Aucun créneau libre disponible pour le {date_dt.strftime('%d/%m/%Y')}."
 
-        return f"Créneaux libres pour le {date_dt.strftime('%d/%m/%Y')} : " + ", ".join(free_slots)
+        return f"Créneaux libres pour le {date_dt.strftime('%d/%m/%Y')} : " + ", ".join(
+            f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in windows
+        )
+
+    async def _tool_find_slots_for_style(self, style_name: str, start_date: Optional[str] = None, days: int = 7) -> str:
+        if not start_date:
+            first_day = datetime.now().date()
+        else:
+            try:
+                first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+            except ValueError:
+                return "Format de date invalide. Utilisez YYYY-MM-DD."
+        days = _search_days(days)
+
+        result = await self.db.execute(
+            select(models.Hairstyle).where(models.Hairstyle.name.ilike(f"%{style_name}%")).limit(1)
+        )
+        style = result.scalars().first()
+        if not style:
+            return f"Prestation '{style_name}' non trouvée dans le catalogue. Veuillez préciser une prestation valide."
+
+        duration = style_duration(style)
+        range_start = datetime.combine(first_day, datetime.min.time())
+        busy = await AppointmentService(self.db).busy_intervals(range_start, range_start + timedelta(days=days))
+        placements = slot_engine.placements(busy, duration, first_day, days, not_before=datetime.now())
+
+        last_day = first_day + timedelta(days=days - 1)
+        period = f"du {first_day.strftime('%d/%m')} au {last_day.strftime('%d/%m')}"
+        if not placements:
+            return f"Aucun créneau assez long pour {style.name} {period}."
+
+        hours, minutes = divmod(int(duration.total_seconds() // 60), 60)
+        label = f"{hours}h{minutes:02d}" if minutes else f"{hours}h"
+        msg = f"Créneaux possibles pour {style.name} ({label}) {period} :\n"
+        for first, last in placements:
+            day = f"{WEEKDAY_NAMES_FR[first.weekday()]} {first.strftime('%d/%m')}"
+            if first == last:
+                msg += f"- {day} : début à {first.strftime('%H:%M')}\n"
+            else:
+                msg += f"- {day} : début entre {first.strftime('%H:%M')} et {last.strftime('%H:%M')}\n"
+        return msg
 
     async def _tool_block_time_slot(self, customer_name: str, style_name: str, date_time: str) -> str:
         try:
@@ -278,50 +423,37 @@ class LLMService:
             return "Format date_time invalide. Utilisez YYYY-MM-DD HH:MM."
 
         # Chercher le hairstyle par nom (fuzzy search simple)
-        style = self.db.query(models.Hairstyle).filter(models.Hairstyle.name.ilike(f"%{style_name}%")).first()
+        result = await self.db.execute(
+            select(models.Hairstyle).where(models.Hairstyle.name.ilike(f"%{style_name}%")).limit(1)
+        )
+        style = result.scalars().first()
         if not style:
             # Créer un style temporaire ou renvoyer erreur ? Renvoyons erreur pour l'instant
             return f"Prestation '{style_name}' non trouvée dans le catalogue. Veuillez préciser une prestation valide."
 
-        # Vérifier si le créneau est libre
-        duration = self._parse_duration(style.duration)
-        end_time = date_time_dt + duration
-
-        overlapping = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.status != "canceled")
-            .filter(models.Appointment.date < end_time)
-            .all()
-        )
-        
-        for a in overlapping:
-            appt_start = a.date
-            appt_duration = self._parse_duration(a.style.duration if a.style else "2h")
-            appt_end = appt_start + appt_duration
-            if (date_time_dt < appt_end) and (end_time > appt_start):
-                return f"Conflit de planning : un rendez-vous ({a.customer_name}) est déjà prévu de {appt_start.strftime('%H:%M')} à {appt_end.strftime('%H:%M')}."
-
-        # Créer le RDV
+        # Créer le RDV si le créneau est libre (vérification et insertion atomiques)
         new_appt = models.Appointment(
             style_id=style.id,
             customer_name=customer_name,
             telephone="Unknown", # À améliorer si possible
             date=date_time_dt,
+            end_at=compute_end_at(date_time_dt, style),
             status="confirmed"
         )
-        self.db.add(new_appt)
-        self.db.commit()
-        self.db.refresh(new_appt)
+        # Our read transaction would keep a pooled connection while the reservation takes another
+        await self.db.commit()
+        a, booked = await AppointmentService.reserve(AsyncSessionLocal, new_appt)
+        if not booked:
+            return f"Conflit de planning : un rendez-vous ({a.customer_name}) est déjà prévu de {a.date.strftime('%H:%M')} à {a.end_at.strftime('%H:%M')}."
+        response_cache.invalidate_day(date_time_dt)
 
-        return f"Rendez-vous confirmé pour {customer_name} ({style.name}) le {date_time_dt.strftime('%d/%m/%Y à %H:%M')}. [ID: {new_appt.id[:8]}]"
+        return f"Rendez-vous confirmé pour {customer_name} ({style.name}) le {date_time_dt.strftime('%d/%m/%Y à %H:%M')}. [ID: {new_appt.short_code}]"
 
     async def _tool_cancel_appointment(self, appointment_id: Optional[str] = None, customer_name: Optional[str] = None) -> str:
-        query = self.db.query(models.Appointment).filter(models.Appointment.status != "canceled")
-        
         if appointment_id:
-            appt = query.filter(models.Appointment.id.like(f"{appointment_id}%")).first()
+            appt = await AppointmentService(self.db).find_by_short_code(appointment_id, active_only=True)
         elif customer_name:
-            appt = query.filter(models.Appointment.customer_name.ilike(f"%{customer_name}%")).order_by(models.Appointment.date.desc()).first()
+            appt = await AppointmentService(self.db).find_by_customer_name(customer_name, active_only=True)
         else:
             return "Veuillez fournir un ID de rendez-vous ou un nom de client."
 
@@ -329,16 +461,7 @@ class LLMService:
             return "Rendez-vous introuvable."
 
         appt.status = "canceled"
-        self.db.commit()
+        await self.db.commit()
+        response_cache.invalidate_day(appt.date)
 
         return f"Le rendez-vous de {appt.customer_name} le {appt.date.strftime('%d/%m/%Y à %H:%M')} a été annulé avec succès."
-
-    def _parse_duration(self, duration_str: str) -> timedelta:
-        """Parse duration string like '4h' or '3h30' into timedelta."""
-        import re
-        match = re.match(r"(\d+)h(?:(\d+))?", duration_str)
-        if not match:
-            return timedelta(hours=2)  # Default
-        hours = int(match.group(1))
-        minutes = int(match.group(2)) if match.group(2) else 0
-        return timedelta(hours=hours, minutes=minutes)
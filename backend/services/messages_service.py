@@ -1,17 +1,24 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
+from typing import BinaryIO, Optional, Union
+from groq import AsyncGroq
 import models
 import logging
 from services.llm_service import LLMService
+from services.appointment_service import AppointmentService
+from services.intent_router import IntentRouter
+from services.conversation_memory import conversation_memory
+from services.transcription_backends import TranscriptionBackend
 
 logger = logging.getLogger(__name__)
 
 class MessagesService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, llm_client: Optional[AsyncGroq] = None, transcriber: Optional[TranscriptionBackend] = None):
         self.db = db
-        self.llm_service = LLMService(db)
+        self.llm_service = LLMService(db, client=llm_client, transcriber=transcriber)
+        self.intent_router = IntentRouter(self.llm_service)
 
-    async def process_message(self, text: str, sender_id: str) -> str:
+    async def process_message(self, text: str, sender_id: str, raise_errors: bool = False) -> str:
         content = text.strip().upper()
         
         if content == "TODAY":
@@ -33,21 +40,31 @@ class MessagesService:
                 "- Annuler un rendez-vous"
             )
 
+        # Requêtes simples (ex: "rdv demain") traitées localement sans appel LLM
+        reply = await self.intent_router.route(text)
+        if reply is not None:
+            # Kept in the conversation so a follow-up handled by the LLM has the context
+            await conversation_memory.append(sender_id, text, reply)
+            return reply
+
         # Utilisation du LLM pour les requêtes en langage naturel
-        return await self.llm_service.process_message(text, sender_id)
+        return await self.llm_service.process_message(text, sender_id, raise_errors=raise_errors)
 
-    async def process_audio_message(self, audio_content: bytes, filename: str, sender_id: str) -> str:
-        """Transcribe audio and process the resulting text."""
+    async def process_audio_message(self, audio: Union[bytes, BinaryIO], filename: str, sender_id: str,
+                                    digest: Optional[str] = None, raise_errors: bool = False) -> str:
+        """Transcribe audio and process the resulting text (see LLMService.process_message for `raise_errors`)."""
         try:
-            transcription = await self.llm_service.transcribe_audio(audio_content, filename)
+            transcription = await self.llm_service.transcribe_audio(audio, filename, digest=digest)
             if not transcription or transcription.strip() == "":
                 return "Je n'ai pas pu comprendre votre message audio. Pourriez-vous répéter ?"
             
             logger.info(f"Transcribed text: {transcription}")
-            response = await self.process_message(transcription, sender_id)
+            response = await self.process_message(transcription, sender_id, raise_errors=raise_errors)
             return f"🎤 *Transcription :* {transcription}\n\n{response}"
         except Exception as e:
             logger.error(f"Error in process_audio_message: {e}")
+            if raise_errors:
+                raise
             return "Une erreur est survenue lors du traitement de votre message audio."
 
     async def _get_today_appointments(self) -> str:
@@ -55,14 +72,7 @@ class MessagesService:
         start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = start_of_day + timedelta(days=1)
         
-        appts = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.date >= start_of_day)
-            .filter(models.Appointment.date < end_of_day)
-            .filter(models.Appointment.status != "canceled")
-            .order_by(models.Appointment.date)
-            .all()
-        )
+        appts = await AppointmentService(self.db).list_appointments(start_of_day, end_of_day)
 
         if not appts:
             return "Aucun rendez-vous prévu pour aujourd'hui."
@@ -80,14 +90,7 @@ class MessagesService:
         start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = start_of_day + timedelta(days=7)
 
-        appts = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.date >= start_of_day)
-            .filter(models.Appointment.date < end_of_day)
-            .filter(models.Appointment.status != "canceled")
-            .order_by(models.Appointment.date)
-            .all()
-        )
+        appts = await AppointmentService(self.db).list_appointments(start_of_day, end_of_day)
 
         if not appts:
             return "Aucun rendez-vous prévu pour les prochains jours."
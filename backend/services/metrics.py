@@ -0,0 +1,222 @@
+"""Counters and histograms exposed on /metrics in the Prometheus text format.
+
+Dependency-free on purpose: an observation is a dict lookup and a bisect under a
+lock, cheap enough to run on every request and every database query. Histograms
+keep per-bucket counts only, so memory is fixed per label combination; labels
+are limited to bounded values (route templates, tool and stage names).
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+BYTE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+AUDIO_SECONDS_BUCKETS = (5, 15, 30, 60, 120, 300, 600)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        # Label values are expected to be strings already
+        return tuple(map(labels.__getitem__, self.labelnames))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            items = [(key, self._snapshot(value)) for key, value in items]
+        for key, value in items:
+            lines.extend(self._samples(list(zip(self.labelnames, key)), value))
+        return lines
+
+    def _snapshot(self, value):
+        return value
+
+    @abstractmethod
+    def _samples(self, labels, value) -> List[str]:
+        """Exposition lines of one label combination."""
+
+
+class Counter(Metric):
+    """Monotonic total; by convention the name ends with _total."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, labels, value) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_number(value)}"]
+
+
+class Histogram(Metric):
+    """Distribution over fixed upper bounds, rendered as cumulative `le` buckets with _sum and _count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # One slot per bucket plus +Inf, then sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def _snapshot(self, value):
+        return list(value)
+
+    def _samples(self, labels, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state):
+            cumulative += count
+            le = _format_labels(labels + [("le", _format_number(bound))])
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_number(state[-1])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, until the last body chunk.",
+    ("method", "route", "status"))
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Duration of one database statement.", ("operation",), QUERY_BUCKETS)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Database statements run while serving one HTTP request.", ("route",), COUNT_BUCKETS)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "db_duration_per_request_seconds", "Time spent in database statements while serving one HTTP request.",
+    ("route",), QUERY_BUCKETS + (2.5, 5))
+GROQ_CHAT_SECONDS = Histogram(
+    "groq_chat_duration_seconds", "Latency of a Groq chat completion.", ("stage",))
+GROQ_CHAT_TOKENS = Histogram(
+    "groq_chat_tokens", "Tokens of a Groq chat completion (prompt, cached part of the prompt, completion).",
+    ("stage", "kind"), TOKEN_BUCKETS)
+TRANSCRIPTION_SECONDS = Histogram(
+    "transcription_duration_seconds", "Latency of a speech-to-text call (cache misses only).", ("backend",))
+LLM_TOOL_SECONDS = Histogram(
+    "llm_tool_duration_seconds", "Execution time of a tool called by the LLM.", ("tool", "outcome"))
+AUDIO_PAYLOAD_BYTES = Histogram(
+    "audio_payload_bytes", "Size of accepted voice-note uploads.", (), BYTE_BUCKETS)
+AUDIO_DURATION_SECONDS = Histogram(
+    "audio_duration_seconds", "Duration of accepted Ogg voice notes, when readable from the headers.",
+    (), AUDIO_SECONDS_BUCKETS)
+
+# Database statements of the HTTP request being served: [count, seconds]
+_request_queries: ContextVar[Optional[List[float]]] = ContextVar("request_queries", default=None)
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "WITH"}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    operation = statement.lstrip()[:8].split(None, 1)[0].upper() if statement.strip() else ""
+    DB_QUERY_SECONDS.observe(elapsed, operation=operation if operation in _OPERATIONS else "OTHER")
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+        queries[1] += elapsed
+
+
+def instrument_engine(engine: Engine):
+    """Time every statement of `engine` (pass `async_engine.sync_engine` for an async engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests per route template and counting their database statements."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_queries.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                         method=scope["method"], route=route, status=str(status))
+            DB_QUERIES_PER_REQUEST.observe(queries[0], route=route)
+            DB_SECONDS_PER_REQUEST.observe(queries[1], route=route)
@@ -0,0 +1,346 @@
+"""Outbound WhatsApp notifications: persistent outbox, rate limit and digests.
+
+Notifications are written to the outbound_messages table, then handed to a
+single asyncio worker through an in-process queue. The worker waits a short
+window so that a burst for the same chat and topic goes out as one digest, and
+sends through a token bucket matched to the gateway's limits. Failed sends are
+retried with exponential backoff; on shutdown the queue is drained within a
+timeout and anything left stays in the outbox for the next start.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import Request
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from config import (
+    NOTIFY_BATCH_WINDOW_SECONDS,
+    NOTIFY_DRAIN_TIMEOUT_SECONDS,
+    NOTIFY_MAX_ATTEMPTS,
+    NOTIFY_RETRY_BASE_SECONDS,
+    WAWP_ACCESS_TOKEN,
+    WAWP_API_INSTANCE,
+    WAWP_BASE_URL,
+    WAWP_SEND_TEXT_PATH,
+    WHATSAPP_BURST,
+    WHATSAPP_RATE_PER_MINUTE,
+)
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# WhatsApp rejects longer text messages; larger digests are split
+WHATSAPP_MAX_TEXT_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n———\n\n"
+DIGEST_TITLES = {"booking": "🔔 *{count} nouvelles réservations*"}
+DEFAULT_DIGEST_TITLE = "🔔 *{count} notifications*"
+
+Send = Callable[[str, str], Awaitable[None]]
+
+
+class GatewayError(Exception):
+    """A send refused by the gateway; `retry_after` (seconds) comes from a 429."""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def to_chat_id(number: str) -> str:
+    """WhatsApp chat id of a phone number; ids that already have a suffix are kept."""
+    return number if "@" in number else f"{number}@c.us"
+
+
+class WawpSender:
+    """Sends text messages through the WAWP gateway on the shared HTTP client."""
+
+    def __init__(self, http_client: httpx.AsyncClient, base_url: Optional[str] = WAWP_BASE_URL,
+                 instance_id: Optional[str] = WAWP_API_INSTANCE, access_token: Optional[str] = WAWP_ACCESS_TOKEN):
+        self.http_client = http_client
+        self.base_url = base_url
+        self.instance_id = instance_id
+        self.access_token = access_token
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.base_url and self.instance_id and self.access_token)
+
+    async def __call__(self, chat_id: str, text: str):
+        if not self.configured:
+            raise GatewayError("WAWP_BASE_URL, WAWP_API_INSTANCE and WAWP_ACCESS_TOKEN must be set", retryable=False)
+        try:
+            response = await self.http_client.post(f"{self.base_url.rstrip('/')}{WAWP_SEND_TEXT_PATH}", json={
+                "instance_id": self.instance_id,
+                "access_token": self.access_token,
+                "chatId": to_chat_id(chat_id),
+                "message": text,
+            })
+        except httpx.HTTPError as e:
+            raise GatewayError(f"WAWP unreachable: {e}") from e
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "")
+            raise GatewayError("WAWP rate limit reached", retry_after=float(retry_after) if retry_after.isdigit() else None)
+        if response.status_code >= 500:
+            raise GatewayError(f"WAWP error {response.status_code}")
+        if response.status_code >= 400:
+            raise GatewayError(f"WAWP rejected the message ({response.status_code}): {response.text[:200]}", retryable=False)
+
+
+class RateLimiter:
+    """Token bucket: `rate_per_minute` messages sustained, bursts of up to `burst`."""
+
+    def __init__(self, rate_per_minute: float = WHATSAPP_RATE_PER_MINUTE, burst: int = WHATSAPP_BURST):
+        self.rate = rate_per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited_seconds = 0.0
+
+    def pause(self, seconds: float):
+        """Stop sending for `seconds` (gateway asked to back off), then restart from an empty bucket."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                delay = self.paused_until - now
+                self.updated = self.paused_until
+            else:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            self.waited_seconds += delay
+            await asyncio.sleep(delay)
+
+
+def digest_text(messages: List[models.OutboundMessage]) -> str:
+    if len(messages) == 1:
+        return messages[0].text
+    title = DIGEST_TITLES.get(messages[0].topic, DEFAULT_DIGEST_TITLE).format(count=len(messages))
+    return f"{title}\n\n" + DIGEST_SEPARATOR.join(m.text for m in messages)
+
+
+def group_messages(messages: List[models.OutboundMessage]) -> List[List[models.OutboundMessage]]:
+    """Group messages sharing a chat and a topic, in order of first arrival, within the text length limit.
+
+    Messages without a topic are always sent on their own.
+    """
+    groups: Dict[tuple, List[models.OutboundMessage]] = {}
+    for message in messages:
+        key = (message.chat_id, message.topic) if message.topic else (message.id,)
+        groups.setdefault(key, []).append(message)
+
+    batches = []
+    for group in groups.values():
+        batch: List[models.OutboundMessage] = []
+        for message in group:
+            if batch and len(digest_text(batch + [message])) > WHATSAPP_MAX_TEXT_LENGTH:
+                batches.append(batch)
+                batch = []
+            batch.append(message)
+        batches.append(batch)
+    return batches
+
+
+class NotificationDispatcher:
+    """Single worker sending the outbox through a rate limiter, in digests when notifications arrive in bursts."""
+
+    def __init__(
+        self,
+        send: Send,
+        limiter: Optional[RateLimiter] = None,
+        batch_window: float = NOTIFY_BATCH_WINDOW_SECONDS,
+        max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+        retry_base: float = NOTIFY_RETRY_BASE_SECONDS,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.send = send
+        self.limiter = limiter or RateLimiter()
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.session_factory = session_factory
+        self._queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._retries = set()
+        self.sends = 0
+        self.digests = 0
+        self.send_errors = 0
+
+    async def notify(self, db: AsyncSession, chat_id: str, text: str, topic: Optional[str] = None) -> models.OutboundMessage:
+        """Store a notification in the outbox and queue it; sending happens in the background."""
+        message = models.OutboundMessage(chat_id=chat_id, text=text, topic=topic)
+        db.add(message)
+        await db.commit()
+        self._queue.put_nowait(message.id)
+        return message
+
+    # Worker ------------------------------------------------------------------
+
+    async def start(self):
+        async with self.session_factory() as db:
+            # Sends interrupted by a restart are attempted again
+            await db.execute(
+                update(models.OutboundMessage)
+                .where(models.OutboundMessage.status == "sending")
+                .values(status="queued")
+            )
+            await db.commit()
+            pending = (await db.execute(
+                select(models.OutboundMessage.id, models.OutboundMessage.next_run_at)
+                .where(models.OutboundMessage.status == "queued")
+                .order_by(models.OutboundMessage.id)
+            )).all()
+        if pending:
+            logger.info(f"Resuming {len(pending)} queued notifications")
+        self._stopping.clear()
+        now = datetime.now()
+        for message_id, next_run_at in pending:
+            self._schedule([message_id], (next_run_at - now).total_seconds() if next_run_at else 0)
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self, timeout: float = NOTIFY_DRAIN_TIMEOUT_SECONDS):
+        """Send what is already queued, within `timeout`; later retries stay in the outbox."""
+        if self._task is None:
+            return
+        self._stopping.set()
+        for task in self._retries:
+            task.cancel()
+        await asyncio.gather(*self._retries, return_exceptions=True)
+        self._queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Notification drain timed out after {timeout:.0f}s, the rest stays in the outbox")
+        self._task = None
+
+    def _schedule(self, message_ids: List[int], delay: float):
+        if self._stopping.is_set():
+            # A send failed while draining: the rows keep their next_run_at for the next start()
+            return
+        if delay <= 0:
+            for message_id in message_ids:
+                self._queue.put_nowait(message_id)
+            return
+        task = asyncio.create_task(self._requeue_later(message_ids, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue_later(self, message_ids: List[int], delay: float):
+        await asyncio.sleep(delay)
+        for message_id in message_ids:
+            self._queue.put_nowait(message_id)
+
+    async def _worker(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            # Let a burst accumulate so it goes out as one digest (not when draining)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.batch_window)
+            except asyncio.TimeoutError:
+                pass
+            message_ids = [first]
+            stop = False
+            while not self._queue.empty():
+                message_id = self._queue.get_nowait()
+                if message_id is None:
+                    stop = True
+                else:
+                    message_ids.append(message_id)
+            try:
+                await self._dispatch(message_ids)
+            except Exception as e:
+                # The messages stay in the outbox and are resumed at the next start
+                logger.error(f"Notification dispatch failed: {e}")
+            if stop:
+                return
+
+    async def _dispatch(self, message_ids: List[int]):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(models.OutboundMessage)
+                .where(models.OutboundMessage.id.in_(message_ids), models.OutboundMessage.status == "queued")
+                .order_by(models.OutboundMessage.id)
+            )
+            for batch in group_messages(list(result.scalars().all())):
+                await self._deliver(db, batch)
+
+    async def _deliver(self, db: AsyncSession, batch: List[models.OutboundMessage]):
+        for message in batch:
+            message.status = "sending"
+            message.attempts += 1
+        await db.commit()
+
+        await self.limiter.acquire()
+        try:
+            await self.send(batch[0].chat_id, digest_text(batch))
+        except Exception as e:
+            self.send_errors += 1
+            self._failed(batch, e)
+        else:
+            self.sends += 1
+            if len(batch) > 1:
+                self.digests += 1
+            now = datetime.now()
+            for message in batch:
+                message.status = "sent"
+                message.sent_at = now
+                message.error = None
+            logger.info(f"Sent {len(batch)} notification(s) to {batch[0].chat_id}")
+        await db.commit()
+
+    def _failed(self, batch: List[models.OutboundMessage], error: Exception):
+        if isinstance(error, GatewayError) and error.retry_after:
+            self.limiter.pause(error.retry_after)
+        attempts = max(message.attempts for message in batch)
+        retryable = getattr(error, "retryable", True)
+        if not retryable or attempts >= self.max_attempts:
+            for message in batch:
+                message.status = "failed"
+                message.error = str(error)
+            logger.error(f"Notification to {batch[0].chat_id} failed after {attempts} attempt(s): {error}")
+            return
+        delay = self.retry_base * 2 ** (attempts - 1)
+        for message in batch:
+            message.status = "queued"
+            message.error = str(error)
+            message.next_run_at = datetime.now() + timedelta(seconds=delay)
+        logger.warning(f"Notification to {batch[0].chat_id} attempt {attempts} failed ({error}), retrying in {delay:.1f}s")
+        self._schedule([message.id for message in batch], delay)
+
+    async def stats(self):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(models.OutboundMessage.status, func.count())
+                .group_by(models.OutboundMessage.status)
+            )
+            counts = dict(result.all())
+        return {
+            "pending": self._queue.qsize(),
+            "sends": self.sends,
+            "digests": self.digests,
+            "send_errors": self.send_errors,
+            "rate_limit_wait_seconds": round(self.limiter.waited_seconds, 1),
+            **counts,
+        }
+
+
+# Dependency
+def get_notification_dispatcher(request: Request) -> NotificationDispatcher:
+    return request.app.state.notification_dispatcher
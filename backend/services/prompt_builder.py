@@ -0,0 +1,182 @@
+"""Prompt and tool-schema templates for LLMService, compiled once at import.
+
+The system prompt puts the stable instructions first and the volatile parts
+(catalogue, then today's date) last, so consecutive requests share the longest
+possible prefix and benefit from provider-side prompt caching.
+"""
+import logging
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+_DATE_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "date": {
+            "type": "string",
+            "description": "Date au format YYYY-MM-DD"
+        }
+    },
+    "required": ["date"]
+}
+
+TOOL_SCHEMAS: Tuple[Dict[str, Any], ...] = (
+    {
+        "type": "function",
+        "function": {
+            "name": "list_appointments",
+            "description": "Liste les rendez-vous d'une journée.",
+            "parameters": _DATE_PARAMETERS,
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_free_slots",
+            "description": "Trouve les créneaux libres d'une journée.",
+            "parameters": _DATE_PARAMETERS,
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_slots_for_style",
+            "description": "Trouve où placer une prestation (selon sa durée) sur plusieurs jours.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "style_name": {"type": "string"},
+                    "start_date": {"type": "string", "description": "Premier jour, au format YYYY-MM-DD"},
+                    "days": {"type": "integer", "description": "Nombre de jours à parcourir (7 par défaut)"}
+                },
+                "required": ["style_name"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "block_time_slot",
+            "description": "Bloque un créneau horaire.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "customer_name": {"type": "string"},
+                    "style_name": {"type": "string"},
+                    "date_time": {"type": "string", "description": "YYYY-MM-DD HH:MM"}
+                },
+                "required": ["customer_name", "style_name", "date_time"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "cancel_appointment",
+            "description": "Annule un rendez-vous.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "appointment_id": {"type": "string", "description": "Code du rendez-vous (8 caractères) ou son début"},
+                    "customer_name": {"type": "string"}
+                },
+                "required": []
+            }
+        }
+    },
+)
+
+TOOL_NAMES = tuple(tool["function"]["name"] for tool in TOOL_SCHEMAS)
+
+# Sent as-is to the API: one list object shared by every request
+_TOOLS_PAYLOAD: List[Dict[str, Any]] = list(TOOL_SCHEMAS)
+
+SYSTEM_INSTRUCTIONS = (
+    "Tu es l'assistant de gestion d'Anip Hair. "
+    "Utilise les outils pour répondre aux demandes."
+)
+
+
+@lru_cache(maxsize=8)
+def system_prompt(style_names: Tuple[str, ...], today: date) -> str:
+    """Stable instructions first, then the catalogue, then the date (changes daily)."""
+    return (
+        f"{SYSTEM_INSTRUCTIONS} "
+        f"Catalogue : {', '.join(style_names)}. "
+        f"Date du jour : {today.isoformat()}."
+    )
+
+
+def tools() -> List[Dict[str, Any]]:
+    return _TOOLS_PAYLOAD
+
+
+def build_messages(text: str, style_names: Sequence[str], today: date,
+                   history: Sequence[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+    """System prompt, then the sender's previous turns, then the new message."""
+    return [
+        {"role": "system", "content": system_prompt(tuple(style_names), today)},
+        *history,
+        {"role": "user", "content": text},
+    ]
+
+
+_stats: Dict[str, Any] = {
+    "completions": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "cached_tokens": 0,
+    "time_to_first_token_ms": None,
+}
+
+
+def record_usage(response, latency_ms: float, stage: str):
+    """Log and aggregate the token counts of a completion.
+
+    Without streaming, time-to-first-token is estimated from the provider's queue
+    and prompt processing times when reported (Groq), else from the call latency.
+    """
+    metrics.GROQ_CHAT_SECONDS.observe(latency_ms / 1000, stage=stage)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+    queue_time = getattr(usage, "queue_time", None)
+    prompt_time = getattr(usage, "prompt_time", None)
+    ttft_ms: Optional[float] = latency_ms
+    if prompt_time is not None:
+        ttft_ms = ((queue_time or 0) + prompt_time) * 1000
+
+    metrics.GROQ_CHAT_TOKENS.observe(prompt_tokens, stage=stage, kind="prompt")
+    metrics.GROQ_CHAT_TOKENS.observe(cached_tokens, stage=stage, kind="cached")
+    metrics.GROQ_CHAT_TOKENS.observe(completion_tokens, stage=stage, kind="completion")
+
+    _stats["completions"] += 1
+    _stats["prompt_tokens"] += prompt_tokens
+    _stats["completion_tokens"] += completion_tokens
+    _stats["cached_tokens"] += cached_tokens
+    previous = _stats["time_to_first_token_ms"]
+    _stats["time_to_first_token_ms"] = ttft_ms if previous is None else 0.8 * previous + 0.2 * ttft_ms
+
+    logger.info(
+        f"LLM {stage}: {prompt_tokens} prompt tokens ({cached_tokens} cached), "
+        f"{completion_tokens} completion tokens, ~{ttft_ms:.0f} ms to first token, {latency_ms:.0f} ms total"
+    )
+
+
+def stats() -> Dict[str, Any]:
+    completions = _stats["completions"]
+    ttft = _stats["time_to_first_token_ms"]
+    return {
+        **_stats,
+        "time_to_first_token_ms": round(ttft, 1) if ttft is not None else None,
+        "avg_prompt_tokens": round(_stats["prompt_tokens"] / completions, 1) if completions else 0.0,
+    }
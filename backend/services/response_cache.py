@@ -0,0 +1,88 @@
+import time
+import logging
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+from services.intent_router import normalize
+
+logger = logging.getLogger(__name__)
+
+# Tools that only read appointments; answers built solely from them can be cached
+READ_ONLY_TOOLS = {"list_appointments", "list_free_slots", "find_slots_for_style"}
+
+
+def _day(value: Union[date, datetime, str]) -> str:
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value[:10]
+
+
+class ResponseCache:
+    """TTL + LRU cache of LLM answers to read-only questions, invalidated per appointment day."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, days the answer depends on, answer)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, frozenset, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, text: str) -> Tuple[str, str]:
+        # The current date is part of the key since "demain" means something else tomorrow
+        return normalize(text), date.today().isoformat()
+
+    def get(self, text: str) -> Optional[str]:
+        key = self._key(text)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, text: str, answer: str, days: Iterable[Union[date, datetime, str]],
+            ttl_seconds: Optional[float] = None):
+        """Cache `answer`; `ttl_seconds` shortens the lifetime of this entry (answers that age with the clock)."""
+        if self.max_entries <= 0:
+            return
+        key = self._key(text)
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        self._entries[key] = (time.monotonic() + ttl, frozenset(_day(d) for d in days), answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_day(self, day: Union[date, datetime, str]):
+        """Drop every cached answer that depends on the appointments of `day`."""
+        target = _day(day)
+        stale = [key for key, (_, days, _) in self._entries.items() if target in days]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self.invalidations += len(stale)
+            logger.info(f"Invalidated {len(stale)} cached answers for {target}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+response_cache = ResponseCache()
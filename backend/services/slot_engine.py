@@ -0,0 +1,158 @@
+"""Free-slot search over sorted busy intervals.
+
+Busy intervals are merged in one pass, then the gaps inside the opening hours
+of each day are read off directly, at a configurable granularity. Placements
+for a given duration are the gap starts where the whole appointment fits.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import OPENING_HOURS, SLOT_GRANULARITY_MINUTES
+
+Interval = Tuple[datetime, datetime]
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+WEEKDAY_NAMES_FR = ("lun.", "mar.", "mer.", "jeu.", "ven.", "sam.", "dim.")
+
+
+def parse_opening_hours(spec: str) -> Dict[int, List[Tuple[time, time]]]:
+    """Parse "mon-fri 09:00-18:00; sat 09:00-12:00,14:00-17:00" into weekday -> ranges.
+
+    Weekdays are numbered as in date.weekday() (Monday = 0); days not listed are closed.
+    Raises ValueError on a malformed spec.
+    """
+    hours: Dict[int, List[Tuple[time, time]]] = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        match = re.fullmatch(r"([a-z]{3})(?:-([a-z]{3}))?\s+(.+)", entry.lower())
+        if not match or match.group(1) not in WEEKDAYS or (match.group(2) or match.group(1)) not in WEEKDAYS:
+            raise ValueError(f"Invalid opening hours entry: {entry!r}")
+        first = WEEKDAYS.index(match.group(1))
+        last = WEEKDAYS.index(match.group(2) or match.group(1))
+        ranges = []
+        for period in match.group(3).split(","):
+            try:
+                opens, closes = (time.fromisoformat(t.strip()) for t in period.split("-"))
+            except ValueError as e:
+                raise ValueError(f"Invalid opening hours period: {period!r}") from e
+            if closes <= opens:
+                raise ValueError(f"Opening hours period ends before it starts: {period!r}")
+            ranges.append((opens, closes))
+        for weekday in range(first, last + 1):
+            hours[weekday] = sorted(ranges)
+    return hours
+
+
+DEFAULT_HOURS = parse_opening_hours(OPENING_HOURS)
+
+
+def merge_intervals(busy: Iterable[Interval]) -> List[Interval]:
+    """Merge overlapping or touching intervals; the input must be sorted by start."""
+    merged: List[Interval] = []
+    for start, end in busy:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class SlotEngine:
+    """Free windows and placements at a fixed granularity.
+
+    Times are handled as integer steps of the granularity from the first day's
+    midnight: busy intervals are widened to the grid once, and merging and gap
+    finding are then integer comparisons.
+    """
+
+    def __init__(self, hours: Dict[int, List[Tuple[time, time]]] = DEFAULT_HOURS,
+                 granularity_minutes: int = SLOT_GRANULARITY_MINUTES):
+        self.step = timedelta(minutes=granularity_minutes)
+        steps_per_day = timedelta(days=1) // self.step
+        self.steps_per_day = steps_per_day
+        # weekday -> opening periods in steps from midnight, inner bounds of the grid
+        self._hours = {
+            weekday: [(-(-self._since_midnight(opens) // self.step), self._since_midnight(closes) // self.step)
+                      for opens, closes in ranges]
+            for weekday, ranges in hours.items()
+        }
+
+    @staticmethod
+    def _since_midnight(value: time) -> timedelta:
+        return timedelta(hours=value.hour, minutes=value.minute, seconds=value.second)
+
+    def _free_steps(self, busy: Sequence[Interval], start_day: date, days: int) -> Tuple[datetime, List[Tuple[int, int]]]:
+        origin = datetime.combine(start_day, time())
+        step = self.step
+        # Merged first (cheap datetime comparisons), then widened to the grid (start
+        # floored, end ceiled), which can make neighbours touch and merge again
+        merged: List[List[int]] = []
+        for start, end in merge_intervals(busy):
+            first = (start - origin) // step
+            last = -((origin - end) // step)
+            if merged and first <= merged[-1][1]:
+                if last > merged[-1][1]:
+                    merged[-1][1] = last
+            else:
+                merged.append([first, last])
+
+        windows = []
+        i = 0
+        weekday = start_day.weekday()
+        for offset in range(days):
+            base = offset * self.steps_per_day
+            for opens, closes in self._hours.get((weekday + offset) % 7, ()):
+                opens += base
+                closes += base
+                # Busy intervals ending before this period cannot matter for later ones either
+                while i < len(merged) and merged[i][1] <= opens:
+                    i += 1
+                cursor = opens
+                j = i
+                while j < len(merged) and merged[j][0] < closes:
+                    if merged[j][0] > cursor:
+                        windows.append((cursor, merged[j][0]))
+                    cursor = max(cursor, merged[j][1])
+                    j += 1
+                if cursor < closes:
+                    windows.append((cursor, closes))
+        return origin, windows
+
+    def next_step(self, moment: datetime) -> datetime:
+        """First grid time after `moment`, when placements with `not_before=moment` next change."""
+        midnight = datetime.combine(moment.date(), time())
+        return midnight + ((moment - midnight) // self.step + 1) * self.step
+
+    def free_windows(self, busy: Sequence[Interval], start_day: date, days: int = 1) -> List[Interval]:
+        """Free time inside opening hours, aligned to the granularity, in chronological order.
+
+        `busy` must be sorted by start. Opening periods and merged busy intervals are
+        walked together once, so the cost is linear in their total number.
+        """
+        origin, windows = self._free_steps(busy, start_day, days)
+        step = self.step
+        return [(origin + first * step, origin + last * step) for first, last in windows]
+
+    def placements(self, busy: Sequence[Interval], duration: timedelta, start_day: date,
+                   days: int = 1, not_before: Optional[datetime] = None) -> List[Interval]:
+        """Ranges of possible start times for an appointment of `duration`.
+
+        Each returned (first, last) means any start from first to last, in steps of
+        the granularity, fits entirely within opening hours without overlapping.
+        """
+        origin, windows = self._free_steps(busy, start_day, days)
+        step = self.step
+        length = -(-duration // step)
+        earliest = -((origin - not_before) // step) if not_before is not None else None
+        ranges = []
+        for first, last in windows:
+            if earliest is not None:
+                first = max(first, earliest)
+            last -= length
+            if last >= first:
+                ranges.append((origin + first * step, origin + last * step))
+        return ranges
+
+
+slot_engine = SlotEngine()
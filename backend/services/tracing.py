@@ -0,0 +1,369 @@
+"""Per-request tracing with OpenTelemetry-compatible spans.
+
+A trace starts at an entry point (`tracer.start_trace`) and collects nested
+spans for transcription, chat completions, tool calls and database statements.
+It is exported when its root span ends:
+- "console": the span tree with durations, in the log
+- "otlp-file": one OTLP/JSON ExportTraceServiceRequest per line, the format of
+  the OpenTelemetry file exporter (read by the Collector's otlpjsonfile receiver),
+  serialized and written by a background thread so the event loop never does file I/O
+
+Ids and the `traceparent` header follow W3C Trace Context. Sampling is decided
+once per trace from the trace id, like the SDK's TraceIdRatioBased sampler, or
+taken from an incoming traceparent; outside a sampled trace a span costs one
+context-variable lookup, and a sampled trace keeps at most TRACING_MAX_SPANS.
+"""
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import (
+    OTEL_SERVICE_NAME,
+    TRACING_EXPORTER,
+    TRACING_FILE_PATH,
+    TRACING_MAX_SPANS,
+    TRACING_SAMPLE_RATIO,
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = ("none", "console", "otlp-file")
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+# Longer attribute values (SQL, tool arguments) are truncated
+MAX_ATTRIBUTE_LENGTH = 500
+# Finished traces waiting for the file writer; further ones are dropped
+EXPORT_QUEUE_SIZE = 1000
+
+TRACEPARENT_RE = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent span_id, sampled) from a W3C traceparent header, or None if absent or invalid."""
+    match = TRACEPARENT_RE.fullmatch((header or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def traceparent(self) -> str:
+        """Header propagating this span as the parent of a downstream call."""
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self.trace.add(self)
+
+
+class NoopSpan:
+    """Returned outside a sampled trace, so call sites never check."""
+
+    trace_id = None
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Trace:
+    def __init__(self, trace_id: str, max_spans: int):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def add(self, span: Span):
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+
+# Innermost open span of the current task; asyncio tasks inherit it when created
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)[:MAX_ATTRIBUTE_LENGTH]}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Tracer:
+    """Starts traces and spans, samples them and exports finished traces."""
+
+    def __init__(self, exporter: str = TRACING_EXPORTER, sample_ratio: float = TRACING_SAMPLE_RATIO,
+                 file_path: str = TRACING_FILE_PATH, max_spans: int = TRACING_MAX_SPANS,
+                 service_name: str = OTEL_SERVICE_NAME):
+        if exporter not in EXPORTERS:
+            raise ValueError(f"Unknown TRACING_EXPORTER {exporter!r}, expected one of {', '.join(EXPORTERS)}")
+        self.exporter = exporter
+        self.sample_ratio = max(0.0, min(1.0, sample_ratio))
+        # Trace ids whose lower 64 bits fall under the threshold are sampled
+        self._threshold = int(self.sample_ratio * 2 ** 64)
+        self.file_path = file_path
+        self.max_spans = max_spans
+        self.service_name = service_name
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.traces = 0
+        self.sampled = 0
+        self.dropped_spans = 0
+        self.dropped_traces = 0
+
+    @contextmanager
+    def start_trace(self, name: str, traceparent: Optional[str] = None, kind: int = SPAN_KIND_SERVER,
+                    **attributes: Any) -> Iterator[Any]:
+        """Root span of a unit of work (request, background job), exported when it ends.
+
+        Inside an open trace it is a plain child span.
+        """
+        if _current.get() is not None:
+            with self.span(name, kind=kind, **attributes) as span:
+                yield span
+            return
+        if self.exporter == "none":
+            yield NOOP_SPAN
+            return
+
+        self.traces += 1
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = int(trace_id[16:], 16) < self._threshold
+        if not sampled:
+            yield NOOP_SPAN
+            return
+
+        self.sampled += 1
+        trace = Trace(trace_id, self.max_spans)
+        root = Span(trace, name, parent_id, kind, attributes)
+        token = _current.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            root.end()
+            self._export(trace)
+
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Any]:
+        """Child of the current span; a no-op outside a sampled trace."""
+        parent = _current.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+        span = Span(parent.trace, name, parent.span_id, kind, attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    # Export ------------------------------------------------------------------
+
+    def _export(self, trace: Trace):
+        self.dropped_spans += trace.dropped
+        try:
+            if self.exporter == "console":
+                logger.info(self.format_tree(trace))
+            elif self.exporter == "otlp-file":
+                self._start_writer()
+                self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped_traces += 1
+        except Exception as e:
+            logger.error(f"Trace export failed: {e}")
+
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_traces, name="trace-writer", daemon=True)
+                self._writer.start()
+
+    def _write_traces(self):
+        while True:
+            # Everything queued meanwhile goes out in the same write
+            traces = [self._queue.get()]
+            while True:
+                try:
+                    traces.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = "".join(json.dumps(self.to_otlp(trace), ensure_ascii=False) + "\n" for trace in traces)
+                with open(self.file_path, "a", encoding="utf-8") as out:
+                    out.write(lines)
+            except Exception as e:
+                logger.error(f"Trace export failed: {e}")
+            finally:
+                for _ in traces:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until every finished trace is written (tests, shutdown; use a thread from async code)."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def to_otlp(self, trace: Trace) -> Dict[str, Any]:
+        spans = []
+        for span in trace.spans:
+            otlp = {
+                "traceId": trace.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": span.kind,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": _otlp_attributes(span.attributes),
+                "status": {"code": span.status, "message": span.status_message} if span.status else {},
+            }
+            if span.parent_id:
+                otlp["parentSpanId"] = span.parent_id
+            spans.append(otlp)
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "aniphair"}, "spans": spans}],
+        }]}
+
+    @staticmethod
+    def format_tree(trace: Trace) -> str:
+        children: Dict[Optional[str], List[Span]] = {}
+        ids = {span.span_id for span in trace.spans}
+        for span in sorted(trace.spans, key=lambda s: s.start_ns):
+            # The root's parent (from an incoming traceparent) is not part of this trace
+            children.setdefault(span.parent_id if span.parent_id in ids else None, []).append(span)
+
+        lines = [f"Trace {trace.trace_id}" + (f" ({trace.dropped} spans dropped)" if trace.dropped else "")]
+
+        def walk(parent_id: Optional[str], depth: int):
+            for span in children.get(parent_id, ()):
+                attributes = " ".join(f"{key}={str(value)[:80]}" for key, value in span.attributes.items() if value is not None)
+                error = f" ERROR {span.status_message}" if span.status == STATUS_ERROR else ""
+                lines.append(f"{'  ' * depth}{span.name} {span.duration_ms:.1f} ms{error}" + (f"  [{attributes}]" if attributes else ""))
+                walk(span.span_id, depth + 1)
+
+        walk(None, 1)
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": self.exporter,
+            "sample_ratio": self.sample_ratio,
+            "traces": self.traces,
+            "sampled": self.sampled,
+            "dropped_spans": self.dropped_spans,
+            "dropped_traces": self.dropped_traces,
+        }
+
+
+tracer = Tracer()
+
+
+# Database statements ---------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None or context is None:
+        return
+    operation = statement.lstrip()[:8].split(None, 1)[0].upper() if statement.strip() else "SQL"
+    # Parameters are left out: they carry customer names and phone numbers
+    context._trace_span = Span(parent.trace, f"db.{operation.lower()}", parent.span_id, SPAN_KIND_CLIENT, {
+        "db.system": conn.dialect.name,
+        "db.query.text": statement[:MAX_ATTRIBUTE_LENGTH],
+    })
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        context._trace_span = None
+        span.end()
+
+
+def _handle_error(exception_context):
+    span = getattr(exception_context.execution_context, "_trace_span", None)
+    if span is not None:
+        exception_context.execution_context._trace_span = None
+        span.record_error(exception_context.original_exception)
+        span.end()
+
+
+def instrument_engine(engine: Engine):
+    """Record a span per statement of `engine` run inside a sampled trace."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,130 @@
+import asyncio
+import importlib.util
+from abc import ABC, abstractmethod
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Optional
+
+from groq import AsyncGroq
+
+from config import (
+    LOCAL_WHISPER_COMPUTE_TYPE,
+    LOCAL_WHISPER_CPU_THREADS,
+    LOCAL_WHISPER_MODEL,
+    LOCAL_WHISPER_WORKERS,
+    TRANSCRIPTION_BACKEND,
+    TRANSCRIPTION_MAX_CONCURRENCY,
+    TRANSCRIPTION_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Process-wide cap on in-flight Whisper uploads to Groq
+_groq_semaphore = asyncio.Semaphore(TRANSCRIPTION_MAX_CONCURRENCY)
+
+
+class TranscriptionBackend(ABC):
+    """Speech-to-text engine used by LLMService.transcribe_audio."""
+
+    name = "base"
+
+    @abstractmethod
+    async def transcribe(self, audio_file: BinaryIO, filename: str) -> str:
+        """Return the text of the audio read from `audio_file`."""
+
+    async def aclose(self):
+        pass
+
+
+class GroqWhisperBackend(TranscriptionBackend):
+    """Remote Whisper through the Groq API."""
+
+    name = "groq"
+
+    def __init__(self, client: AsyncGroq, model: str = "whisper-large-v3-turbo", language: str = "fr"):
+        self.client = client
+        self.model = model
+        self.language = language
+
+    async def transcribe(self, audio_file: BinaryIO, filename: str) -> str:
+        # The handle is streamed to Groq as-is, no in-memory copy of the audio
+        audio_file.seek(0)
+        async with _groq_semaphore:
+            transcription = await self.client.audio.transcriptions.create(
+                file=(filename, audio_file),
+                model=self.model,
+                response_format="text",
+                language=self.language,
+                timeout=TRANSCRIPTION_TIMEOUT_SECONDS,
+            )
+        return str(transcription).strip()
+
+
+# Model loaded once per worker process by _init_local_worker
+_worker_model = None
+
+
+def _init_local_worker(model_size: str, compute_type: str, cpu_threads: int):
+    global _worker_model
+    from faster_whisper import WhisperModel
+
+    _worker_model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _transcribe_in_worker(path: str, language: str) -> str:
+    segments, _ = _worker_model.transcribe(path, language=language, beam_size=1, vad_filter=True)
+    return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Offline CPU Whisper (faster-whisper / CTranslate2) running in a process pool."""
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_size: str = LOCAL_WHISPER_MODEL,
+        compute_type: str = LOCAL_WHISPER_COMPUTE_TYPE,
+        workers: int = LOCAL_WHISPER_WORKERS,
+        cpu_threads: int = LOCAL_WHISPER_CPU_THREADS,
+        language: str = "fr",
+    ):
+        if importlib.util.find_spec("faster_whisper") is None:
+            raise RuntimeError("TRANSCRIPTION_BACKEND=local requires faster-whisper (uv pip install faster-whisper)")
+        self.language = language
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_local_worker,
+            initargs=(model_size, compute_type, cpu_threads),
+        )
+        logger.info(f"Local Whisper backend: model={model_size} compute_type={compute_type} workers={workers}")
+
+    async def transcribe(self, audio_file: BinaryIO, filename: str) -> str:
+        # Worker processes need a real path; the spool may live in memory or in an unnamed file
+        suffix = os.path.splitext(filename)[1] or ".ogg"
+        with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+            # Up to AUDIO_MAX_BYTES of disk I/O, kept off the event loop
+            await asyncio.to_thread(self._copy_audio, audio_file, tmp)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, _transcribe_in_worker, tmp.name, self.language)
+
+    @staticmethod
+    def _copy_audio(audio_file: BinaryIO, out: BinaryIO):
+        audio_file.seek(0)
+        shutil.copyfileobj(audio_file, out)
+        out.flush()
+
+    async def aclose(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_transcription_backend(groq: Optional[AsyncGroq], name: str = TRANSCRIPTION_BACKEND) -> Optional[TranscriptionBackend]:
+    """Build the backend selected by TRANSCRIPTION_BACKEND."""
+    if name == "local":
+        return LocalWhisperBackend()
+    if name != "groq":
+        raise ValueError(f"Unknown TRANSCRIPTION_BACKEND: {name}")
+    return GroqWhisperBackend(groq) if groq else None
@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Optional
+
+from sqlalchemy import delete, func, select
+
+import models
+from config import TRANSCRIPTION_CACHE_MAX_ENTRIES
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def audio_digest(audio_file: BinaryIO) -> str:
+    """SHA-256 of an audio file, read in chunks from the start."""
+    audio_file.seek(0)
+    digest = hashlib.file_digest(audio_file, "sha256").hexdigest()
+    audio_file.seek(0)
+    return digest
+
+
+class TranscriptionCache:
+    """Transcriptions keyed by the SHA-256 of the audio, persisted in SQLite with LRU eviction.
+
+    Identical voice notes arriving concurrently share a single in-flight transcription.
+    """
+
+    def __init__(self, max_entries: int = TRANSCRIPTION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_transcribe(self, digest: str, audio_size: int, transcribe: Callable[[], Awaitable[str]]) -> str:
+        cached = await self._lookup(digest)
+        if cached is not None:
+            self.hits += 1
+            logger.info(f"Transcription cache hit for {digest[:12]}")
+            return cached
+
+        task = self._in_flight.get(digest)
+        if task is not None:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight transcription for {digest[:12]}")
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._transcribe_and_store(digest, audio_size, transcribe))
+            self._in_flight[digest] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(digest, None))
+
+        # Shielded so a cancelled request does not abort the call other requests are waiting on
+        return await asyncio.shield(task)
+
+    async def _transcribe_and_store(self, digest: str, audio_size: int, transcribe: Callable[[], Awaitable[str]]) -> str:
+        text = await transcribe()
+        if text:
+            await self._store(digest, audio_size, text)
+        return text
+
+    async def _lookup(self, digest: str) -> Optional[str]:
+        if self.max_entries <= 0:
+            return None
+        async with AsyncSessionLocal() as db:
+            entry = await db.get(models.Transcription, digest)
+            if entry is None:
+                return None
+            entry.last_used_at = datetime.now()
+            await db.commit()
+            return entry.text
+
+    async def _store(self, digest: str, audio_size: int, text: str):
+        if self.max_entries <= 0:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.merge(models.Transcription(sha256=digest, text=text, audio_size=audio_size, last_used_at=datetime.now()))
+            await db.flush()
+            overflow = await self._count(db) - self.max_entries
+            if overflow > 0:
+                oldest = (
+                    select(models.Transcription.sha256)
+                    .order_by(models.Transcription.last_used_at)
+                    .limit(overflow)
+                    .subquery()
+                )
+                await db.execute(
+                    delete(models.Transcription).where(models.Transcription.sha256.in_(select(oldest.c.sha256)))
+                )
+                logger.info(f"Evicted {overflow} cached transcriptions")
+            await db.commit()
+
+    @staticmethod
+    async def _count(db) -> int:
+        return (await db.execute(select(func.count()).select_from(models.Transcription))).scalar_one()
+
+    async def stats(self) -> Dict[str, Any]:
+        async with AsyncSessionLocal() as db:
+            entries = await self._count(db)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+transcription_cache = TranscriptionCache()
@@ -1,7 +1,9 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 from services.whatsapp_service import WhatsAppSessionService
 from config import ADMIN_PHONE_NUMBER
+from services.response_cache import response_cache
+from services.appointment_service import AppointmentService
 import os
 import logging
 from typing import Any, Dict
@@ -11,7 +13,7 @@ logger = logging.getLogger(__name__)
 
 
 class WorkflowService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.whatsapp_service = WhatsAppSessionService(db)
         self.admin_number = ADMIN_PHONE_NUMBER
@@ -66,11 +68,8 @@ class WorkflowService:
 
     async def _cmd_list(self, chat_id: str):
         now = datetime.now()
-        appts = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.date >= now.replace(hour=0, minute=0, second=0))
-            .order_by(models.Appointment.date)
-            .all()
+        appts = await AppointmentService(self.db).list_appointments(
+            now.replace(hour=0, minute=0, second=0), include_canceled=True
         )
 
         if not appts:
@@ -80,7 +79,7 @@ class WorkflowService:
             for a in appts:
                 status = "PENDING" if a.status == "pending" else "CONFIRMED"
                 msg += (
-                    f"[{status}] {a.id[:8]} - "
+                    f"[{status}] {a.short_code} - "
                     f"{a.date.strftime('%H:%M')} | "
                     f"{a.customer_name} ({a.style.name})\n"
                 )
@@ -97,18 +96,15 @@ class WorkflowService:
             )
             return
 
-        appt = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.id.like(f"{args[0]}%"))
-            .first()
-        )
+        appt = await AppointmentService(self.db).find_by_short_code(args[0])
 
         if not appt:
             msg = f"Rendez-vous {args[0]} introuvable."
         else:
             appt.status = "confirmed"
-            self.db.commit()
-            msg = f"RDV de {appt.customer_name} ({appt.id[:8]}) confirme."
+            await self.db.commit()
+            response_cache.invalidate_day(appt.date)
+            msg = f"RDV de {appt.customer_name} ({appt.short_code}) confirme."
 
         await self.whatsapp_service.send_message(chat_id=chat_id, text=msg)
 
@@ -120,18 +116,15 @@ class WorkflowService:
             )
             return
 
-        appt = (
-            self.db.query(models.Appointment)
-            .filter(models.Appointment.id.like(f"{args[0]}%"))
-            .first()
-        )
+        appt = await AppointmentService(self.db).find_by_short_code(args[0])
 
         if not appt:
             msg = f"Rendez-vous {args[0]} introuvable."
         else:
             appt.status = "canceled"
-            self.db.commit()
-            msg = f"RDV de {appt.customer_name} ({appt.id[:8]}) annule."
+            await self.db.commit()
+            response_cache.invalidate_day(appt.date)
+            msg = f"RDV de {appt.customer_name} ({appt.short_code}) annule."
 
         await self.whatsapp_service.send_message(chat_id=chat_id, text=msg)
 
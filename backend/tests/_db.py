@@ -0,0 +1,11 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import models
+
+
+async def make_session_factory() -> async_sessionmaker:
+    """Session factory on a fresh in-memory SQLite database holding the app's tables."""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    return async_sessionmaker(engine, expire_on_commit=False)
@@ -0,0 +1,213 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, text
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from migrations import create_customer_name_fts
+from services.intent_router import ID_PREFIX_RE
+from services.appointment_service import (
+    AppointmentService,
+    compute_end_at,
+    decode_cursor,
+    encode_cursor,
+    parse_duration_minutes,
+    parse_price_cents,
+)
+from tests._db import make_session_factory
+
+
+async def _book(db, style, start, status="confirmed"):
+    appt = models.Appointment(
+        style_id=style.id,
+        customer_name="Client",
+        telephone="0000",
+        date=start,
+        end_at=compute_end_at(start, style),
+        status=status,
+    )
+    db.add(appt)
+    await db.commit()
+    return appt
+
+
+async def _query_plan(db, query) -> str:
+    """EXPLAIN QUERY PLAN of the statement a service method runs, with its parameters inlined."""
+    sql = query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    rows = (await db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).fetchall()
+    return " ".join(str(row) for row in rows)
+
+
+async def _find_conflicts():
+    db = (await make_session_factory())()
+    style = models.Hairstyle(name="Twists Passion", price="95€", duration="3h30", image="", category="Moderne")
+    db.add(style)
+    await db.commit()
+
+    day = datetime(2026, 3, 2)
+    booked = await _book(db, style, day.replace(hour=10))
+    await _book(db, style, day.replace(hour=15), status="canceled")
+    await _book(db, style, day - timedelta(days=30))
+
+    service = AppointmentService(db)
+    assert booked.end_at == day.replace(hour=13, minute=30)
+    assert [a.id for a in await service.find_conflicts(day.replace(hour=13), day.replace(hour=14))] == [booked.id]
+    assert await service.find_conflicts(day.replace(hour=13, minute=30), day.replace(hour=17)) == []
+    assert await service.find_conflicts(day.replace(hour=8), day.replace(hour=10)) == []
+
+    plan = await _query_plan(db, AppointmentService._conflicts_query(day.replace(hour=13), day.replace(hour=14)))
+    # A bounded range on the index, not a scan of it in date order
+    assert "SEARCH appointments USING INDEX ix_appointments_date_id_end_at_status (date>? AND date<?)" in plan
+    await db.close()
+
+
+def test_find_conflicts():
+    asyncio.run(_find_conflicts())
+
+
+async def _list_appointments_loads_styles_in_one_query():
+    db = (await make_session_factory())()
+    styles = [
+        models.Hairstyle(name=f"Style {i}", price="50€", duration="1h", image="", category="Moderne")
+        for i in range(5)
+    ]
+    db.add_all(styles)
+    await db.commit()
+
+    day = datetime(2026, 3, 2)
+    for i, style in enumerate(styles):
+        await _book(db, style, day.replace(hour=9 + i))
+    await _book(db, styles[0], day.replace(hour=16), status="canceled")
+    db.expunge_all()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", listener)
+    try:
+        service = AppointmentService(db)
+        appts = await service.list_appointments(day, day + timedelta(days=1))
+        # A lazy load here would raise in an async session, and add one query per row otherwise
+        names = [a.style.name for a in appts]
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", listener)
+
+    assert names == [f"Style {i}" for i in range(5)]
+    assert len(statements) == 1, statements
+    assert len(await service.list_appointments(day, include_canceled=True)) == 6
+    await db.close()
+
+
+def test_list_appointments_loads_styles_in_one_query():
+    asyncio.run(_list_appointments_loads_styles_in_one_query())
+
+
+async def _list_page_keyset():
+    db = (await make_session_factory())()
+    styles = [models.Hairstyle(name=f"Style {i}", price="50€", duration="1h", image="", category="") for i in range(2)]
+    db.add_all(styles)
+    await db.commit()
+
+    day = datetime(2026, 3, 2)
+    for i in range(7):
+        await _book(db, styles[i % 2], day.replace(hour=9 + i), status="canceled" if i == 6 else "confirmed")
+    await _book(db, styles[0], day - timedelta(days=1))
+
+    service = AppointmentService(db)
+    seen, after = [], None
+    while True:
+        page = await service.list_page(start=day, end=day + timedelta(days=1), after=after, limit=3)
+        seen += [row["date"].hour for row in page]
+        if len(page) < 3:
+            break
+        after = decode_cursor(encode_cursor(page[-1]["date"], page[-1]["id"]))
+    assert seen == [9, 10, 11, 12, 13, 14, 15]
+
+    filtered = await service.list_page(start=day, style_id=styles[0].id, status="confirmed", fields=("customer_name",))
+    assert [row["date"].hour for row in filtered] == [9, 11, 13]
+    assert set(filtered[0]) == {"date", "id", "customer_name"}
+
+    # The statements list_page runs: an index range in (date, id) order, never a sort
+    plan = await _query_plan(db, AppointmentService._page_query(
+        start=day, end=day + timedelta(days=1), after=after, limit=3))
+    assert "SEARCH appointments USING INDEX ix_appointments_date_id_end_at_status" in plan
+    assert "TEMP B-TREE" not in plan
+    plan = await _query_plan(db, AppointmentService._page_query(
+        start=day, style_id=styles[0].id, status="confirmed", fields=("customer_name",)))
+    # Either filter index serves it, both in (date, id) order
+    assert ("SEARCH appointments USING INDEX ix_appointments_style_id_date_id" in plan
+            or "SEARCH appointments USING INDEX ix_appointments_status_date_id" in plan)
+    assert "TEMP B-TREE" not in plan
+    await db.close()
+
+
+def test_list_page_keyset():
+    asyncio.run(_list_page_keyset())
+
+
+async def _short_code_and_name_lookups():
+    db = (await make_session_factory())()
+    async with db.bind.begin() as conn:
+        await conn.run_sync(create_customer_name_fts)
+    style = models.Hairstyle(name="Tresses", price="60€", duration="2h", image="", category="")
+    db.add(style)
+    await db.commit()
+
+    day = datetime(2026, 3, 2)
+    for hour, name in [(9, "Hélène Dupont"), (11, "Marie Curie"), (14, "Marie-Hélène Martin")]:
+        db.add(models.Appointment(style_id=style.id, customer_name=name, telephone="0", date=day.replace(hour=hour)))
+    await db.commit()
+    service = AppointmentService(db)
+
+    appt = (await service.list_appointments(day))[0]
+    assert len(appt.short_code) == models.SHORT_CODE_LENGTH
+    assert (await service.find_by_short_code(appt.short_code.upper())).id == appt.id
+    assert (await service.find_by_short_code(appt.short_code[:5])).id == appt.id
+    assert (await service.find_by_short_code(appt.id)).id == appt.id
+    assert await service.find_by_short_code("zzzzzzzz") is None
+
+    # Word prefixes, accents ignored, latest appointment first
+    assert (await service.find_by_customer_name("helene")).customer_name == "Marie-Hélène Martin"
+    assert (await service.find_by_customer_name("Hélène Dup")).customer_name == "Hélène Dupont"
+    assert (await service.find_by_customer_name("marie cur")).customer_name == "Marie Curie"
+    assert await service.find_by_customer_name("Paul") is None
+
+    appt.customer_name = "Paule Durand"
+    await db.commit()
+    assert (await service.find_by_customer_name("paule")).id == appt.id
+    await db.close()
+
+
+def test_short_code_and_name_lookups():
+    asyncio.run(_short_code_and_name_lookups())
+    # Every generated code is recognised by the intent router
+    codes = [models.new_short_code() for _ in range(2000)]
+    assert all(ID_PREFIX_RE.fullmatch(code) for code in codes)
+
+
+def test_numeric_duration_and_price():
+    assert parse_duration_minutes("3h30") == 210
+    assert parse_duration_minutes("4h") == 240
+    assert parse_duration_minutes("sur devis") is None
+    assert parse_price_cents("85€") == 8500
+    assert parse_price_cents("12,5 €") == 1250
+    assert parse_price_cents("") is None
+
+    # duration_minutes takes precedence over the text form
+    style = models.Hairstyle(name="Tresses", price="60€", duration="2h", duration_minutes=150)
+    start = datetime(2026, 3, 2, 10)
+    assert compute_end_at(start, style) == start + timedelta(minutes=150)
+
+
+if __name__ == "__main__":
+    test_find_conflicts()
+    test_list_appointments_loads_styles_in_one_query()
+    test_list_page_keyset()
+    test_short_code_and_name_lookups()
+    test_numeric_duration_and_price()
+    print("OK")
@@ -7,12 +7,12 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.llm_service import LLMService
-from database import SessionLocal
+from database import AsyncSessionLocal
 import models
 
 async def test_audio_transcription():
     load_dotenv()
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     llm_service = LLMService(db)
     
     # Path to the existing audio file found in the workspace
@@ -37,7 +37,7 @@ async def test_audio_transcription():
     except Exception as e:
         print(f"Test failed with error: {e}")
     finally:
-        db.close()
+        await db.close()
 
 if __name__ == "__main__":
     asyncio.run(test_audio_transcription())
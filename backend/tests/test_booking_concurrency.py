@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from database import create_async_db_engine
+from services.appointment_service import AppointmentService, compute_end_at
+
+BOOKINGS = 200
+
+
+async def _parallel_bookings(path):
+    # A file database with the app's engine setup: pool, WAL and BEGIN IMMEDIATE support
+    engine = create_async_db_engine(f"sqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async with sessions() as db:
+        style = models.Hairstyle(name="Tresses", price="60€", duration="2h", image="", category="")
+        db.add(style)
+        await db.commit()
+
+    async def book(start):
+        appt = models.Appointment(
+            style_id=style.id, customer_name="Client", telephone="0000",
+            date=start, end_at=compute_end_at(start, style), status="confirmed",
+        )
+        row, booked = await AppointmentService.reserve(sessions, appt)
+        return None if booked else row
+
+    # Hundreds of bookings of the same slot: exactly one wins
+    slot = datetime(2026, 3, 2, 10)
+    results = await asyncio.gather(*(book(slot) for _ in range(BOOKINGS)))
+    assert results.count(None) == 1
+    # Losers get the winning booking back, readable after its session is gone
+    assert {(c.date, c.end_at, c.style.name) for c in results if c is not None} == {(slot, slot.replace(hour=12), "Tresses")}
+
+    # Bookings that do not overlap all succeed
+    starts = [datetime(2026, 4, 1, 9) + timedelta(hours=2 * i) for i in range(BOOKINGS)]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(book(start) for start in starts))
+    elapsed = time.perf_counter() - started
+    assert results == [None] * BOOKINGS
+    print(f"{BOOKINGS} non-conflicting bookings in {elapsed:.2f}s ({BOOKINGS / elapsed:.0f}/s)")
+
+    async with sessions() as db:
+        count = (await db.execute(select(func.count()).select_from(models.Appointment))).scalar_one()
+    assert count == BOOKINGS + 1
+    await engine.dispose()
+
+
+def test_parallel_bookings_of_one_slot():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        asyncio.run(_parallel_bookings(os.path.join(tmpdir, "bookings.db")))
+
+
+if __name__ == "__main__":
+    test_parallel_bookings_of_one_slot()
+    print("OK")
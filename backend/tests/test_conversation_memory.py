@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import update
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from services import llm_service
+from services.conversation_memory import ConversationMemory
+from services.response_cache import ResponseCache
+from services.prompt_builder import build_messages
+from tests._db import make_session_factory
+
+
+async def _follow_up_history():
+    factory = await make_session_factory()
+    memory = ConversationMemory(max_entries=1, ttl_seconds=60, token_budget=100, session_factory=factory)
+
+    await memory.append("admin", "Bloque Marie pour Tresses demain à 10h", "Créneau bloqué pour Marie.")
+    messages = build_messages("et à 15h plutôt ?", ["Tresses"], datetime(2026, 3, 2).date(), await memory.history("admin"))
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+    assert messages[1]["content"].startswith("Bloque Marie")
+
+    # Evicted from the LRU by another sender, reloaded from SQLite
+    await memory.append("other", "rdv demain", "Aucun rendez-vous.")
+    assert len(await memory.history("admin")) == 2
+    assert memory.loads == 1
+
+    # The budget keeps the most recent turns and clips an oversized one
+    for i in range(10):
+        await memory.append("admin", f"question {i}", "réponse " * 20)
+    turns = await memory._turns("admin")
+    assert sum(t["tokens"] for t in turns) <= 100
+    assert turns[-1]["user"] == "question 9"
+    assert memory.truncated_turns > 0
+    await memory.append("admin", "LIST", "x" * 2000)
+    turns = await memory._turns("admin")
+    assert len(turns) == 1 and turns[0]["tokens"] <= 100 and turns[0]["assistant"].endswith("[…]")
+
+    # Expired conversations are forgotten
+    memory._entries.clear()
+    async with factory() as db:
+        await db.execute(update(models.Conversation).values(updated_at=datetime.now() - timedelta(minutes=5)))
+        await db.commit()
+    assert await memory.history("admin") == []
+
+    stats = await memory.stats()
+    assert stats["stored"] == 2 and stats["avg_history_tokens"] > 0
+
+
+def test_follow_up_history():
+    asyncio.run(_follow_up_history())
+
+
+async def _cached_answer_is_remembered(monkeypatch):
+    factory = await make_session_factory()
+    memory = ConversationMemory(max_entries=4, ttl_seconds=60, token_budget=500, session_factory=factory)
+    cache = ResponseCache(max_entries=4, ttl_seconds=60)
+    cache.set("Quels sont vos tarifs ?", "Tresses : 15 000 FCFA.", [])
+    monkeypatch.setattr(llm_service, "conversation_memory", memory)
+    monkeypatch.setattr(llm_service, "response_cache", cache)
+
+    async with factory() as db:
+        service = llm_service.LLMService(db, client=SimpleNamespace())
+        assert await service.process_message("Quels sont vos tarifs ?", "client-1") == "Tresses : 15 000 FCFA."
+
+    # A follow-up is answered with the cached exchange in its history
+    assert [(m["role"], m["content"]) for m in await memory.history("client-1")] == [
+        ("user", "Quels sont vos tarifs ?"), ("assistant", "Tresses : 15 000 FCFA.")]
+
+
+def test_cached_answer_is_remembered(monkeypatch):
+    asyncio.run(_cached_answer_is_remembered(monkeypatch))
+
+
+if __name__ == "__main__":
+    test_follow_up_history()
+    print("OK")
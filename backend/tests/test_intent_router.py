@@ -0,0 +1,44 @@
+import os
+import sys
+from datetime import date
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.intent_router import parse_intent
+
+STYLES = ["Coiffe Afro", "Nattes Collées", "Twists Passion", "Chignon Haut"]
+TODAY = date(2026, 3, 4)  # mercredi
+
+
+def test_parse_intent():
+    cases = {
+        "rdv demain": ("list_appointments", {"date": "2026-03-05"}),
+        "Quels sont mes rendez-vous pour aujourd'hui ?": ("list_appointments", {"date": "2026-03-04"}),
+        "créneaux libres lundi": ("list_free_slots", {"date": "2026-03-09"}),
+        "Quelles sont les heures creuses pour demain ?": ("list_free_slots", {"date": "2026-03-05"}),
+        "planning du 12/03": ("list_appointments", {"date": "2026-03-12"}),
+        "rdv mercredi prochain": ("list_appointments", {"date": "2026-03-11"}),
+        "annule ab12cd34": ("cancel_appointment", {"appointment_id": "ab12cd34"}),
+        "annule le rdv k7m2xq9p": ("cancel_appointment", {"appointment_id": "k7m2xq9p"}),
+        "Bloque un créneau pour Mariam pour Twists Passion demain à 14h.": (
+            "block_time_slot",
+            {"customer_name": "Mariam", "style_name": "Twists Passion", "date_time": "2026-03-05 14:00"},
+        ),
+    }
+    for text, expected in cases.items():
+        assert parse_intent(text, STYLES, TODAY) == expected, text
+
+    # Ambiguous or incomplete requests fall back to the LLM
+    for text in [
+        "Annule le rendez-vous de Mariam.",
+        "Bloque Mariam demain à 14h",
+        "déplace le rdv de demain à 15h",
+        "Bonjour, comment ça va ?",
+    ]:
+        assert parse_intent(text, STYLES, TODAY) is None, text
+
+
+if __name__ == "__main__":
+    test_parse_intent()
+    print("OK")
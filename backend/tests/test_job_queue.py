@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from config import JOB_MAX_ATTEMPTS
+from services import llm_service
+from services.conversation_memory import ConversationMemory
+from services.job_queue import JobQueue, callback_allowed
+from tests._db import make_session_factory
+
+
+class _FailingCompletions:
+    async def create(self, **kwargs):
+        raise RuntimeError("Groq indisponible")
+
+
+def _clients():
+    groq = SimpleNamespace(chat=SimpleNamespace(completions=_FailingCompletions()))
+    return SimpleNamespace(groq=groq, transcription=None, http_client=None)
+
+
+async def _llm_failure_is_retried(monkeypatch):
+    factory = await make_session_factory()
+    # Keep the shared memory singleton off the application database
+    monkeypatch.setattr(llm_service, "conversation_memory", ConversationMemory(session_factory=factory))
+    queue = JobQueue(_clients(), workers=1)
+    async with factory() as db:
+        job = models.MessageJob(sender_id="client-1", type="text", message="Quels sont vos tarifs ?",
+                                status="running", attempts=1)
+        db.add(job)
+        await db.commit()
+
+        await queue._run(db, job)
+        assert job.status == "queued"
+        assert job.reply is None
+        assert "Groq indisponible" in job.error
+
+        job.attempts = JOB_MAX_ATTEMPTS
+        await db.commit()
+        await queue._run(db, job)
+        assert job.status == "failed"
+        assert job.reply is None
+
+
+def test_llm_failure_is_retried(monkeypatch):
+    asyncio.run(_llm_failure_is_retried(monkeypatch))
+
+
+class _FailingAfterToolsCompletions:
+    """Asks for a listing and a cancellation, then fails on the synthesis completion."""
+
+    def __init__(self, short_code):
+        self.short_code = short_code
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls > 1:
+            raise RuntimeError("Groq indisponible")
+        tool_calls = [
+            SimpleNamespace(id="call_1", function=SimpleNamespace(
+                name="list_appointments", arguments='{"date": "2026-03-02"}')),
+            SimpleNamespace(id="call_2", function=SimpleNamespace(
+                name="cancel_appointment", arguments=f'{{"appointment_id": "{self.short_code}"}}')),
+        ]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=tool_calls))])
+
+
+async def _failure_after_a_write_is_not_retried(monkeypatch):
+    factory = await make_session_factory()
+    monkeypatch.setattr(llm_service, "conversation_memory", ConversationMemory(session_factory=factory))
+    async with factory() as db:
+        style = models.Hairstyle(name="Tresses", price="50€", duration="2h", image="", category="Moderne")
+        db.add(style)
+        await db.commit()
+        appt = models.Appointment(style_id=style.id, customer_name="Marie", telephone="0000",
+                                  date=datetime(2026, 3, 2, 10), end_at=datetime(2026, 3, 2, 12), status="confirmed")
+        db.add(appt)
+        job = models.MessageJob(sender_id="client-1", type="text", message="Annule le rdv de Marie",
+                                status="running", attempts=1)
+        db.add(job)
+        await db.commit()
+
+        groq = SimpleNamespace(chat=SimpleNamespace(completions=_FailingAfterToolsCompletions(appt.short_code)))
+        queue = JobQueue(SimpleNamespace(groq=groq, transcription=None, http_client=None), workers=1)
+        await queue._run(db, job)
+
+        # The cancellation is committed, so the job reports it instead of replaying the turn
+        assert job.status == "done"
+        assert "annulé avec succès" in job.reply
+        await db.refresh(appt)
+        assert appt.status == "canceled"
+
+
+def test_failure_after_a_write_is_not_retried(monkeypatch):
+    asyncio.run(_failure_after_a_write_is_not_retried(monkeypatch))
+
+
+async def _concurrent_idempotency_key(tmp_path):
+    factory = await make_session_factory()
+    queue = JobQueue(_clients(), workers=1)
+    async with factory() as db:
+        first, created = await queue.enqueue_text(db, "client-1", "Bonjour", idempotency_key="msg-1")
+        assert created
+
+    # The second request passed the lookup before the first one committed
+    audio_path = tmp_path / "note.ogg"
+    audio_path.write_bytes(b"OggS")
+    async with factory() as db:
+        job, created = await queue._add(db, models.MessageJob(
+            idempotency_key="msg-1", sender_id="client-1", type="audio", audio_path=str(audio_path)))
+        assert not created
+        assert job.id == first.id
+        assert not audio_path.exists()
+
+
+def test_concurrent_idempotency_key(tmp_path):
+    asyncio.run(_concurrent_idempotency_key(tmp_path))
+
+
+def test_callback_allowlist():
+    allowed = ["https://hooks.example.com/aniphair"]
+    assert callback_allowed("https://hooks.example.com/aniphair", allowed)
+    assert callback_allowed("https://hooks.example.com/aniphair/replies?id=1", allowed)
+    assert not callback_allowed("https://hooks.example.com/aniphair-other", allowed)
+    assert not callback_allowed("https://hooks.example.com.evil.net/aniphair", allowed)
+    assert not callback_allowed("https://hooks.example.com:8443/aniphair", allowed)
+    assert not callback_allowed("http://hooks.example.com/aniphair", allowed)
+    assert not callback_allowed("https://user@hooks.example.com/aniphair", allowed)
+    assert not callback_allowed("http://169.254.169.254/latest/meta-data", allowed)
+    assert not callback_allowed("https://hooks.example.com/aniphair", [])
@@ -10,12 +10,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 load_dotenv()
 
-from database import SessionLocal
+from database import AsyncSessionLocal
 from services.messages_service import MessagesService
 import models
 
 async def test_llm_agent():
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     service = MessagesService(db)
     
     test_queries = [
@@ -38,7 +38,7 @@ async def test_llm_agent():
         except Exception as e:
             print(f"ERROR: {e}\n")
             
-    db.close()
+    await db.close()
 
 if __name__ == "__main__":
     asyncio.run(test_llm_agent())
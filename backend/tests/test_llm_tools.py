@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import llm_service
+from services.llm_service import LLMService
+from services.response_cache import ResponseCache
+
+
+def _tool_call(call_id, name, arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+async def _every_tool_call_is_answered():
+    service = LLMService(db=None, client=SimpleNamespace())
+    results = await service._execute_tool_calls([
+        _tool_call("call_1", "send_sms", "{}"),
+        _tool_call("call_2", "list_free_slots", '{"date": "2026-03-'),
+        _tool_call("call_3", "list_free_slots", json.dumps({"date": "demain"})),
+    ])
+
+    assert [tool_call.id for tool_call, _, _, _ in results] == ["call_1", "call_2", "call_3"]
+    assert results[0][3] == {"error": "Outil inconnu : send_sms"}
+    assert results[1][3]["error"].startswith("Arguments invalides pour list_free_slots")
+    assert results[2][3] == "Format de date invalide. Utilisez YYYY-MM-DD."
+
+
+def test_every_tool_call_is_answered():
+    asyncio.run(_every_tool_call_is_answered())
+
+
+def test_days_read_tolerates_bad_days():
+    week = LLMService._days_read("find_slots_for_style", {"start_date": "2026-03-02", "days": "une semaine"})
+    assert len(week) == 7
+    assert len(LLMService._days_read("find_slots_for_style", {"start_date": "2026-03-02", "days": "3"})) == 3
+    assert len(LLMService._days_read("find_slots_for_style", {"start_date": "2026-03-02", "days": 400})) == 31
+
+
+def test_today_slots_expire_at_the_next_grid_step(monkeypatch):
+    cache = ResponseCache(max_entries=8, ttl_seconds=3600)
+    monkeypatch.setattr(llm_service, "response_cache", cache)
+    service = LLMService(db=None, client=SimpleNamespace())
+    today = datetime.now().date()
+
+    service._cache_if_read_only("créneaux libres aujourd'hui", [("list_free_slots", {"date": today.isoformat()})], "9h-10h")
+    service._cache_if_read_only("créneaux libres demain", [("list_free_slots", {"date": (today + timedelta(days=1)).isoformat()})], "9h-10h")
+    service._cache_if_read_only("rdv aujourd'hui", [("list_appointments", {"date": today.isoformat()})], "Aucun")
+
+    ttl = {key[0]: expires_at - time.monotonic() for key, (expires_at, _, _) in cache._entries.items()}
+    now = datetime.now()
+    # Within a second: the entry was stored a moment before `now` was read
+    assert ttl["creneaux libres aujourd'hui"] <= min(3600, (llm_service.slot_engine.next_step(now) - now).total_seconds()) + 1
+    assert ttl["creneaux libres demain"] > 3599
+    assert ttl["rdv aujourd'hui"] > 3599
@@ -0,0 +1,66 @@
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import metrics
+
+
+def _sample(body, line_start):
+    return [line.split(" ")[-1] for line in body.splitlines() if line.startswith(line_start)]
+
+
+def test_histogram_exposition():
+    histogram = metrics.Histogram("test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, route='/a"b')
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_latency_seconds Test latency.", "# TYPE test_latency_seconds histogram"]
+    # Cumulative buckets, upper bounds inclusive, label values escaped
+    assert lines[2:] == [
+        'test_latency_seconds_bucket{route="/a\\"b",le="0.1"} 2',
+        'test_latency_seconds_bucket{route="/a\\"b",le="1"} 3',
+        'test_latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/a\\"b"} 3.65',
+        'test_latency_seconds_count{route="/a\\"b"} 4',
+    ]
+    metrics.REGISTRY.remove(histogram)
+
+
+def test_requests_and_queries_per_route():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    metrics.instrument_engine(engine.sync_engine)
+
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        async with engine.connect() as conn:
+            for _ in range(3):
+                await conn.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    @app.get("/metrics")
+    async def get_metrics():
+        return metrics.render()
+
+    with TestClient(app) as client:
+        for item_id in range(5):
+            assert client.get(f"/items/{item_id}").status_code == 200
+        client.get("/missing")
+        body = client.get("/metrics").json()
+
+    # One series per route template, not per path
+    assert _sample(body, 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"}') == ["5"]
+    assert _sample(body, 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}') == ["1"]
+    # Three statements in each request, counted through SQLAlchemy's greenlets
+    assert _sample(body, 'db_queries_per_request_sum{route="/items/{item_id}"}') == ["15"]
+    assert _sample(body, 'db_queries_per_request_bucket{route="/items/{item_id}",le="2"}') == ["0"]
+    assert _sample(body, 'db_queries_per_request_bucket{route="/items/{item_id}",le="5"}') == ["5"]
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import sys
+import time
+
+from sqlalchemy import select
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from services.notification_dispatcher import GatewayError, NotificationDispatcher, RateLimiter
+from tests._db import make_session_factory
+
+
+async def _statuses(factory):
+    async with factory() as db:
+        result = await db.execute(select(models.OutboundMessage.text, models.OutboundMessage.status))
+        return dict(result.all())
+
+
+async def _burst_retries_and_drain():
+    factory = await make_session_factory()
+    sent = []
+    failures = {"Panne": 1}
+
+    async def send(chat_id, text):
+        for marker, remaining in failures.items():
+            if marker in text and remaining:
+                failures[marker] -= 1
+                raise GatewayError("gateway down")
+        if "Refusé" in text:
+            raise GatewayError("invalid number", retryable=False)
+        sent.append((chat_id, text))
+
+    dispatcher = NotificationDispatcher(send, limiter=RateLimiter(rate_per_minute=6000, burst=10),
+                                        batch_window=0.1, retry_base=0.05, session_factory=factory)
+    await dispatcher.start()
+
+    # A burst of bookings goes out as one digest; other chats and topics are kept apart
+    async with factory() as db:
+        for i in range(5):
+            await dispatcher.notify(db, "admin", f"Réservation {i}", topic="booking")
+        await dispatcher.notify(db, "admin", "Rappel", topic=None)
+        await dispatcher.notify(db, "other", "Réservation X", topic="booking")
+    await asyncio.sleep(0.3)
+    assert len(sent) == 3
+    chat_id, digest = sent[0]
+    assert chat_id == "admin" and digest.startswith("🔔 *5 nouvelles réservations*")
+    assert [digest.index(f"Réservation {i}") for i in range(5)] == sorted(digest.index(f"Réservation {i}") for i in range(5))
+    assert sent[1:] == [("admin", "Rappel"), ("other", "Réservation X")]
+    assert dispatcher.digests == 1
+
+    # Transient failures are retried, permanent ones are not
+    async with factory() as db:
+        await dispatcher.notify(db, "admin", "Panne", topic=None)
+        await dispatcher.notify(db, "admin", "Refusé", topic=None)
+    await asyncio.sleep(0.4)
+    statuses = await _statuses(factory)
+    assert statuses["Panne"] == "sent" and statuses["Refusé"] == "failed"
+
+    # Stopping drains what is queued without waiting for the batch window
+    async with factory() as db:
+        await dispatcher.notify(db, "admin", "Dernier", topic="booking")
+    dispatcher.batch_window = 60
+    started = time.perf_counter()
+    await dispatcher.stop(timeout=5)
+    assert time.perf_counter() - started < 1
+    assert sent[-1] == ("admin", "Dernier")
+
+    # A send failing during the drain leaves no retry task behind; the next start resumes it
+    failures["Panne"] = 1
+    await dispatcher.start()
+    async with factory() as db:
+        await dispatcher.notify(db, "admin", "Panne au drain", topic=None)
+    await dispatcher.stop(timeout=5)
+    assert not dispatcher._retries
+    assert (await _statuses(factory))["Panne au drain"] == "queued"
+    await dispatcher.start()
+    await asyncio.sleep(0.3)
+    await dispatcher.stop(timeout=5)
+    assert (await _statuses(factory))["Panne au drain"] == "sent"
+
+
+def test_burst_retries_and_drain():
+    asyncio.run(_burst_retries_and_drain())
+
+
+async def _rate_limit_and_restart():
+    factory = await make_session_factory()
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append((time.perf_counter(), text))
+
+    # 2 sends at once, then 10 per second
+    dispatcher = NotificationDispatcher(send, limiter=RateLimiter(rate_per_minute=600, burst=2),
+                                        batch_window=0, session_factory=factory)
+    async with factory() as db:
+        # Left in the outbox by a previous run, one of them interrupted mid-send
+        db.add_all([models.OutboundMessage(chat_id="admin", text=f"Message {i}") for i in range(5)])
+        db.add(models.OutboundMessage(chat_id="admin", text="Interrompu", status="sending", attempts=1))
+        await db.commit()
+    await dispatcher.start()
+    await dispatcher.stop(timeout=5)
+
+    assert [text for _, text in sent] == [f"Message {i}" for i in range(5)] + ["Interrompu"]
+    elapsed = sent[-1][0] - sent[0][0]
+    assert 0.35 < elapsed < 1
+    assert dispatcher.limiter.waited_seconds > 0.3
+
+
+def test_rate_limit_and_restart():
+    asyncio.run(_rate_limit_and_restart())
+
+
+if __name__ == "__main__":
+    test_burst_retries_and_drain()
+    test_rate_limit_and_restart()
+    print("OK")
@@ -0,0 +1,60 @@
+import os
+import sys
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.slot_engine import SlotEngine, merge_intervals, parse_opening_hours
+
+MONDAY = date(2026, 3, 2)
+
+
+def at(day_offset, hour, minute=0):
+    return datetime.combine(MONDAY + timedelta(days=day_offset), time(hour, minute))
+
+
+def test_parse_opening_hours():
+    hours = parse_opening_hours("mon-fri 09:00-18:00; sat 09:00-12:00,14:00-17:00")
+    assert hours[0] == hours[4] == [(time(9), time(18))]
+    assert hours[5] == [(time(9), time(12)), (time(14), time(17))]
+    assert 6 not in hours
+    for spec in ("lundi 09:00-18:00", "mon 18:00-09:00", "mon 9h-18h"):
+        with pytest.raises(ValueError):
+            parse_opening_hours(spec)
+
+
+def test_merge_intervals():
+    busy = [(at(0, 9), at(0, 10)), (at(0, 9, 30), at(0, 11)), (at(0, 11), at(0, 12)), (at(0, 14), at(0, 15))]
+    assert merge_intervals(busy) == [(at(0, 9), at(0, 12)), (at(0, 14), at(0, 15))]
+
+
+def test_free_windows_and_placements():
+    engine = SlotEngine(parse_opening_hours("mon-fri 09:00-18:00; sat 09:00-12:00,14:00-17:00"), granularity_minutes=15)
+    busy = [
+        (at(0, 9, 10), at(0, 10, 20)),   # unaligned, merged with the next one
+        (at(0, 10, 20), at(0, 12)),
+        (at(0, 15), at(0, 17, 50)),
+        (at(1, 8), at(1, 19)),           # Tuesday fully booked
+    ]
+    # 17:50-18:00 is shorter than one step once aligned
+    assert engine.free_windows(busy, MONDAY) == [(at(0, 12), at(0, 15))]
+
+    # A 3h30 style fits nowhere on Monday or Tuesday, starts 09:00-14:30 on Wednesday
+    placements = engine.placements(busy, timedelta(hours=3, minutes=30), MONDAY, days=7)
+    assert placements[0] == (at(2, 9), at(2, 14, 30))
+    # Saturday's periods are too short, Sunday is closed
+    assert [p[0].weekday() for p in placements] == [2, 3, 4]
+
+    # Nothing before not_before, rounded up to the granularity
+    placements = engine.placements([], timedelta(hours=1), MONDAY, not_before=at(0, 16, 5))
+    assert placements == [(at(0, 16, 15), at(0, 17))]
+
+
+def test_next_step():
+    engine = SlotEngine(granularity_minutes=15)
+    assert engine.next_step(at(0, 10, 7)) == at(0, 10, 15)
+    assert engine.next_step(at(0, 10, 15)) == at(0, 10, 30)
+    assert engine.next_step(at(0, 23, 50)) == at(1, 0)
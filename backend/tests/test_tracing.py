@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Add parent directory to path to import backend modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import tracing
+from services.tracing import NOOP_SPAN, Tracer
+
+PARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+async def _traced_request(tracer, engine):
+    with tracer.start_trace("messages.receive", traceparent=PARENT) as root:
+        async def tool(name):
+            with tracer.span(f"tool.{name}"):
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+
+        # Concurrent tool calls each keep the request span as parent
+        await asyncio.gather(tool("a"), tool("b"))
+        try:
+            with tracer.span("chat"):
+                raise TimeoutError("Groq timeout")
+        except TimeoutError:
+            pass
+    return root
+
+
+def test_otlp_file_export():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    tracing.instrument_engine(engine.sync_engine)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "traces.jsonl")
+        tracer = Tracer(exporter="otlp-file", sample_ratio=0, file_path=path)
+        root = asyncio.run(_traced_request(tracer, engine))
+        tracer.flush()
+        with open(path) as f:
+            exported = [json.loads(line) for line in f]
+
+    # The incoming traceparent is continued even with a 0 sample ratio, since its sampled flag is set
+    assert len(exported) == 1 and root.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    spans = {s["name"]: s for s in exported[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    assert set(spans) == {"messages.receive", "tool.a", "tool.b", "db.select", "chat"}
+    assert spans["messages.receive"]["parentSpanId"] == "00f067aa0ba902b7"
+    assert spans["tool.a"]["parentSpanId"] == spans["tool.b"]["parentSpanId"] == root.span_id
+    assert spans["chat"]["status"] == {"code": 2, "message": "TimeoutError: Groq timeout"}
+
+    statements = [s for s in exported[0]["resourceSpans"][0]["scopeSpans"][0]["spans"] if s["name"] == "db.select"]
+    assert {s["parentSpanId"] for s in statements} == {spans["tool.a"]["spanId"], spans["tool.b"]["spanId"]}
+    assert {"key": "db.query.text", "value": {"stringValue": "SELECT 1"}} in statements[0]["attributes"]
+
+
+def test_sampling():
+    tracer = Tracer(exporter="console", sample_ratio=0.25)
+    sampled = 0
+    for _ in range(2000):
+        with tracer.start_trace("job") as root:
+            with tracer.span("child") as child:
+                sampled += root is not NOOP_SPAN
+                assert (child is NOOP_SPAN) == (root is NOOP_SPAN)
+    assert 400 < sampled < 600 and tracer.sampled == sampled
+
+    # An upstream decision not to sample is kept
+    with tracer.start_trace("job", traceparent=PARENT[:-2] + "00") as root:
+        assert root is NOOP_SPAN
+    # Disabled tracing never samples
+    with Tracer(exporter="none", sample_ratio=1).start_trace("job") as root:
+        assert root is NOOP_SPAN